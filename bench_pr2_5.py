@@ -0,0 +1,549 @@
+import argparse # для чтения аргументов
+import json # результаты дочерних замеров
+import os # для работы с путями/папками
+import random # случайные ребра для синтетических графов
+import resource # пиковый rss процесса
+import subprocess # каждый замер rss - в отдельном процессе
+import sys # для кода выхода
+import tempfile # временная папка под сгенерированные pom
+import time # замеры времени
+import timeit # замеры времени
+import tracemalloc # пиковая память
+import xml.etree.ElementTree as ET  # прежний способ разбора pom.xml
+from collections import defaultdict, deque
+from itertools import product
+
+import pr2_5
+
+
+# прежняя версия read_pom: строит дерево целиком и ищет зависимости через findall
+def read_pom_etree(pom_path: str):
+    if not os.path.exists(pom_path):
+        return None
+
+    root = ET.parse(pom_path).getroot()
+    ns = {"m": "http://maven.apache.org/POM/4.0.0"}
+
+    deps = []
+    for dep in root.findall("m:dependencies/m:dependency", ns):
+        group_id = dep.find("m:groupId", ns)
+        artifact_id = dep.find("m:artifactId", ns)
+        version = dep.find("m:version", ns)
+        deps.append({
+            "groupId": group_id.text if group_id is not None else "",
+            "artifactId": artifact_id.text if artifact_id is not None else "",
+            "version": version.text if version is not None else ""
+        })
+    return deps
+
+
+# pom в каноническом порядке maven: зависимости, затем объемные build, profiles, reporting.
+# full_model - перед зависимостями еще parent, properties и dependencyManagement: когда все
+# разделы модели пройдены, потоковый разбор заканчивается на первом разделе сборки
+def write_large_pom(path: str, n_deps: int, n_plugins: int, n_profiles: int, full_model: bool = False):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<project xmlns="http://maven.apache.org/POM/4.0.0">\n')
+        f.write("    <modelVersion>4.0.0</modelVersion>\n")
+        if full_model:
+            f.write(
+                "    <parent>\n        <groupId>bench</groupId>\n        <artifactId>parent</artifactId>\n"
+                "        <version>1.0</version>\n    </parent>\n"
+                "    <properties>\n        <java.version>17</java.version>\n    </properties>\n"
+                "    <dependencyManagement>\n        <dependencies>\n"
+                "            <dependency>\n                <groupId>bench.g0</groupId>\n"
+                "                <artifactId>managed</artifactId>\n                <version>2.0</version>\n"
+                "            </dependency>\n        </dependencies>\n    </dependencyManagement>\n"
+            )
+        f.write("    <groupId>bench</groupId>\n    <artifactId>big</artifactId>\n    <version>1.0</version>\n")
+
+        f.write("    <dependencies>\n")
+        for i in range(n_deps):
+            f.write(
+                "        <dependency>\n"
+                f"            <groupId>bench.g{i % 7}</groupId>\n"
+                f"            <artifactId>dep{i}</artifactId>\n"
+                f"            <version>1.{i}</version>\n"
+                "        </dependency>\n"
+            )
+        f.write("    </dependencies>\n")
+
+        plugin = (
+            "            <plugin>\n"
+            "                <groupId>org.apache.maven.plugins</groupId>\n"
+            "                <artifactId>maven-plugin-{i}</artifactId>\n"
+            "                <version>3.{i}</version>\n"
+            "                <configuration><source>17</source><target>17</target>"
+            "<args><arg>-Xlint:all</arg><arg>-parameters</arg></args></configuration>\n"
+            "            </plugin>\n"
+        )
+        f.write("    <build>\n        <plugins>\n")
+        for i in range(n_plugins):
+            f.write(plugin.format(i=i))
+        f.write("        </plugins>\n    </build>\n")
+
+        f.write("    <profiles>\n")
+        for i in range(n_profiles):
+            f.write(f"        <profile>\n            <id>p{i}</id>\n            <build>\n                <plugins>\n")
+            for k in range(10):
+                f.write(plugin.format(i=k))
+            f.write("                </plugins>\n            </build>\n        </profile>\n")
+        f.write("    </profiles>\n")
+
+        f.write("    <reporting>\n        <plugins>\n")
+        for i in range(n_plugins):
+            f.write(plugin.format(i=i))
+        f.write("        </plugins>\n    </reporting>\n")
+        f.write("</project>\n")
+
+
+# сравнение прежнего read_pom с потоковым разбором
+def bench_read_pom(args: argparse.Namespace):
+    sizes = [(20, 20, 5), (50, 200, 50), (100, 2000, 500)] # (зависимостей, плагинов, профилей)
+
+    print(f"{'размер pom':>12} {'модель':>8} {'etree, мс':>12} {'поток, мс':>12} {'ускорение':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for (n_deps, n_plugins, n_profiles), full_model in product(sizes, (False, True)):
+            path = os.path.join(tmp, f"pom_{n_deps}_{n_plugins}_{int(full_model)}.xml")
+            write_large_pom(path, n_deps, n_plugins, n_profiles, full_model)
+
+            # оба способа должны давать одинаковые координаты (scope, optional и исключения
+            # прежний read_pom не читал)
+            parsed = [
+                {field: dep[field] for field in pr2_5.DEPENDENCY_FIELDS}
+                for dep in pr2_5._parse_pom(path)["dependencies"]
+            ]
+            if read_pom_etree(path) != parsed:
+                print("результаты разбора не совпадают")
+                sys.exit(1)
+
+            t_old = min(timeit.repeat(lambda: read_pom_etree(path), number=args.number, repeat=3))
+            t_new = min(timeit.repeat(lambda: pr2_5._parse_pom(path), number=args.number, repeat=3))
+
+            size_kb = os.path.getsize(path) / 1024
+            print(
+                f"{size_kb:>9.0f} КБ {'полная' if full_model else 'deps':>8} {t_old / args.number * 1000:>12.3f} "
+                f"{t_new / args.number * 1000:>12.3f} {t_old / t_new:>9.1f}x"
+            )
+
+
+# ребра синтетического графа: у каждой вершины fanout случайных соседей
+def random_edges(n_nodes: int, fanout: int, seed: int = 1):
+    rnd = random.Random(seed)
+    for i in range(n_nodes):
+        yield i, [rnd.randrange(n_nodes) for _ in range(fanout)]
+
+
+# граф как раньше: строка-ключ и список новых строк на каждое ребро
+def build_dict_graph(n_nodes: int, fanout: int):
+    graph: dict[str, list[str]] = {}
+    for i, neighbors in random_edges(n_nodes, fanout):
+        graph[f"p{i}:1.0"] = [f"p{k}:1.0" for k in neighbors]
+    return graph
+
+
+def build_compact_graph(n_nodes: int, fanout: int):
+    graph = pr2_5.CompactGraph()
+    for i, neighbors in random_edges(n_nodes, fanout):
+        node_id = graph.intern(f"p{i}:1.0")
+        graph.add_row(node_id, [graph.intern(f"p{k}:1.0") for k in neighbors])
+    return graph
+
+
+def peak_memory(build, *args) -> tuple[int, int]:
+    tracemalloc.start()
+    graph = build(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del graph
+    return current, peak
+
+
+# память графа: dict[str, list[str]] против CompactGraph
+def bench_graph(args: argparse.Namespace):
+    n_nodes = args.edges // args.fanout
+    print(f"вершин {n_nodes}, ребер {n_nodes * args.fanout}")
+    print(f"{'граф':>14} {'итог, МБ':>10} {'пик, МБ':>10}")
+    for title, build in (("dict", build_dict_graph), ("CompactGraph", build_compact_graph)):
+        current, peak = peak_memory(build, n_nodes, args.fanout)
+        print(f"{title:>14} {current / 2**20:>10.1f} {peak / 2**20:>10.1f}")
+
+
+# элементы svg в прежней раскладке (весь уровень в одну строку, прямые ребра) по одному
+def svg_elements_old_layout(graph, root: str):
+    level = {root: 0}
+    q = deque([root])
+    while q:
+        node = q.popleft()
+        for n in graph.get(node, []):
+            if n not in level:
+                level[n] = level[node] + 1
+                q.append(n)
+
+    levels = defaultdict(list)
+    for node, lvl in level.items():
+        levels[lvl].append(node)
+
+    node_width, node_height, margin, horiz_gap, vert_gap = 220, 40, 40, 40, 80
+    max_nodes_in_level = max(len(nodes) for nodes in levels.values())
+    svg_width = max_nodes_in_level * node_width + (max_nodes_in_level - 1) * horiz_gap + margin * 2
+    num_levels = len(levels)
+    svg_height = num_levels * node_height + (num_levels - 1) * vert_gap + margin * 2
+
+    yield '<?xml version="1.0" encoding="UTF-8" standalone="no"?>'
+    yield f'<svg xmlns="http://www.w3.org/2000/svg" width="{svg_width}" height="{svg_height}">'
+    positions = {}
+    for lvl in sorted(levels.keys()):
+        nodes_on_level = levels[lvl]
+        n = len(nodes_on_level)
+        start_x = (svg_width - (n * node_width + (n - 1) * horiz_gap)) / 2
+        y = margin + lvl * (node_height + vert_gap)
+        for i, node in enumerate(nodes_on_level):
+            x = start_x + i * (node_width + horiz_gap)
+            yield (
+                f'<rect x="{x}" y="{y}" width="{node_width}" height="{node_height}" '
+                f'style="fill:#9C8B72;stroke:#5B7187;stroke-width:2"/>'
+            )
+            text = node.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+            yield (
+                f'<text x="{x + 10}" y="{y + 25}" font-size="14" '
+                f'style="font-family: monospace">{text}</text>'
+            )
+            positions[node] = (x, y, x + node_width / 2)
+
+    for src, neighbors in graph.items():
+        if src not in positions:
+            continue
+        _, y_src, x_center_src = positions[src]
+        for dst in neighbors:
+            if dst not in positions:
+                continue
+            _, y_dst, x_center_dst = positions[dst]
+            yield (
+                f'<line x1="{x_center_src}" y1="{y_src + node_height}" '
+                f'x2="{x_center_dst}" y2="{y_dst}" '
+                f'style="stroke:#5B7187;stroke-width:2"/>'
+            )
+            yield (
+                f'<polygon points="'
+                f'{x_center_dst - 5},{y_dst - 5} {x_center_dst + 5},{y_dst - 5} {x_center_dst},{y_dst}'
+                f'" style="fill:#5B7187"/>'
+            )
+    yield "</svg>"
+
+
+# прежняя версия save_graph_as_svg: все строки документа копятся в списке и склеиваются в конце
+def save_graph_as_svg_lines(graph, svg_path: str, root: str):
+    svg_lines = list(svg_elements_old_layout(graph, root))
+    with open(svg_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(svg_lines))
+
+
+# потоковая запись в той же прежней раскладке: отличается от save_graph_as_svg_lines
+# только способом записи, поэтому разница в пике rss - это эффект потоковой записи
+def save_graph_as_svg_stream(graph, svg_path: str, root: str):
+    with open(svg_path, "w", encoding="utf-8", buffering=pr2_5.SVG_WRITE_BUFFER) as f:
+        for line in svg_elements_old_layout(graph, root):
+            f.write(line)
+            f.write("\n")
+
+
+# слоистый граф зависимостей: ребра идут только к вершинам с большим номером
+def layered_graph(n_nodes: int, fanout: int, seed: int = 1) -> "pr2_5.CompactGraph":
+    rnd = random.Random(seed)
+    graph = pr2_5.CompactGraph()
+    for i in range(n_nodes):
+        graph.intern(f"p{i}:1.0")
+    for i in range(n_nodes):
+        hi = min(n_nodes - 1, i + 50)
+        neighbors = [rnd.randint(i + 1, hi) for _ in range(fanout)] if i < n_nodes - 1 else []
+        graph.add_row(i, neighbors)
+    return graph
+
+
+# lines и stream - одна раскладка, разные способы записи; layout - текущий save_graph_as_svg
+# (потоковая запись и раскладка с упорядочиванием уровней, переносом строк и обходом ребер)
+SVG_IMPLS = {
+    "lines": save_graph_as_svg_lines,
+    "stream": save_graph_as_svg_stream,
+    "layout": pr2_5.save_graph_as_svg,
+}
+
+
+# дочерний процесс: строит граф, пишет svg выбранным способом и сообщает пиковый rss
+def bench_svg_child(args: argparse.Namespace):
+    graph = layered_graph(args.nodes, args.fanout)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    SVG_IMPLS[args.impl](graph, args.out, "p0:1.0")
+    elapsed = time.perf_counter() - started
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"before": rss_before, "after": rss_after, "time": elapsed}))
+
+
+# пиковый rss при записи svg: прежняя сборка строк в памяти против потоковой записи
+# в той же раскладке, и отдельной строкой - текущая запись с новой раскладкой
+def bench_svg(args: argparse.Namespace):
+    print(f"вершин {args.nodes}, ребер ~{args.nodes * args.fanout}")
+    print(f"{'запись':>8} {'пик rss до, МБ':>15} {'пик rss после, МБ':>18} {'прирост, МБ':>12} {'время, с':>9} {'файл, МБ':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for impl in SVG_IMPLS:
+            out = os.path.join(tmp, f"graph_{impl}.svg")
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "svg_child", "--impl", impl,
+                 "--nodes", str(args.nodes), "--fanout", str(args.fanout), "--out", out],
+                check=True, capture_output=True, text=True
+            )
+            r = json.loads(result.stdout)
+            # ru_maxrss в линуксе - в килобайтах
+            print(
+                f"{impl:>8} {r['before'] / 1024:>15.1f} {r['after'] / 1024:>18.1f} "
+                f"{(r['after'] - r['before']) / 1024:>12.1f} {r['time']:>9.2f} "
+                f"{os.path.getsize(out) / 2**20:>9.1f}"
+            )
+
+
+# синтетический репозиторий в раскладке тестового: <repo>/<имя>/<версия>/pom.xml.
+# Пакеты разложены по depth уровням, корень p0 - на нулевом; у каждого пакета до
+# fanout зависимостей на следующие уровни, и каждый пакет уровня k+1 зависит хотя бы
+# от одного пакета уровня k, так что весь репозиторий достижим из корня.
+# Доля cycle_density пакетов получает обратное ребро на своего предка - это циклы.
+# padding - число объемных плагинов после зависимостей (размер pom)
+def generate_repo(
+    repo: str,
+    n_nodes: int,
+    fanout: int = 3,
+    depth: int = 10,
+    cycle_density: float = 0.0,
+    padding: int = 0,
+    seed: int = 1
+) -> dict[int, list[int]]:
+    rnd = random.Random(seed)
+    depth = max(1, min(depth, n_nodes))
+
+    # уровень 0 - только корень, остальные пакеты поровну по уровням 1..depth-1
+    levels: list[list[int]] = [[0]] + [[] for _ in range(depth - 1)]
+    for i in range(1, n_nodes):
+        k = 1 + (i - 1) * (depth - 1) // (n_nodes - 1) if depth > 1 else 0
+        levels[k].append(i)
+
+    deps: dict[int, list[int]] = {i: [] for i in range(n_nodes)}
+    parent: dict[int, int] = {} # ребро остова, по нему ищутся предки для циклов
+    for k in range(len(levels) - 1):
+        for child in levels[k + 1]:
+            parent[child] = rnd.choice(levels[k])
+            deps[parent[child]].append(child)
+
+    # остальные ребра - на любой более глубокий уровень
+    level_of = {node: k for k, nodes in enumerate(levels) for node in nodes}
+    deeper_start = [sum(len(nodes) for nodes in levels[:k + 1]) for k in range(len(levels))]
+    for node in range(n_nodes):
+        lo = deeper_start[level_of[node]]
+        while len(deps[node]) < fanout and lo < n_nodes:
+            dst = rnd.randrange(lo, n_nodes)
+            if dst not in deps[node]:
+                deps[node].append(dst)
+            elif len(deps[node]) >= n_nodes - lo:
+                break
+
+    # обратное ребро на случайного предка по остову всегда замыкает цикл
+    for node in range(1, n_nodes):
+        if rnd.random() < cycle_density:
+            ancestors = []
+            a = node
+            while a in parent:
+                a = parent[a]
+                ancestors.append(a)
+            deps[node].append(rnd.choice(ancestors))
+
+    plugin = (
+        "        <plugin><groupId>org.apache.maven.plugins</groupId>"
+        "<artifactId>maven-plugin-{i}</artifactId><version>3.{i}</version>"
+        "<configuration><source>17</source><target>17</target></configuration></plugin>\n"
+    )
+    for node in range(n_nodes):
+        d = os.path.join(repo, f"p{node}", "1.0")
+        os.makedirs(d, exist_ok=True)
+        with open(os.path.join(d, "pom.xml"), "w", encoding="utf-8") as f:
+            f.write('<project xmlns="http://maven.apache.org/POM/4.0.0">\n')
+            f.write(f"    <groupId>bench</groupId>\n    <artifactId>p{node}</artifactId>\n    <version>1.0</version>\n")
+            f.write("    <dependencies>\n")
+            for dst in deps[node]:
+                f.write(
+                    "        <dependency><groupId>bench</groupId>"
+                    f"<artifactId>p{dst}</artifactId><version>1.0</version></dependency>\n"
+                )
+            f.write("    </dependencies>\n")
+            if padding:
+                f.write("    <build><plugins>\n")
+                for i in range(padding):
+                    f.write(plugin.format(i=i))
+                f.write("    </plugins></build>\n")
+            f.write("</project>\n")
+
+    return deps
+
+
+def bench_gen(args: argparse.Namespace):
+    started = time.perf_counter()
+    deps = generate_repo(
+        args.repo, args.nodes, args.fanout, args.depth, args.cycle_density, args.padding, args.seed
+    )
+    print(
+        f"репозиторий {args.repo}: пакетов {len(deps)}, ребер {sum(map(len, deps.values()))}, "
+        f"{time.perf_counter() - started:.1f} с"
+    )
+
+
+# этапы обработки одного репозитория; каждый получает результат предыдущего
+SUITE_PHASES = ("read_pom", "bfs", "load_order", "plantuml", "svg")
+
+
+def run_suite_phases(repo: str, out_dir: str, memory: bool) -> dict[str, dict[str, float]]:
+    results: dict[str, dict[str, float]] = {}
+    pom_paths = [
+        os.path.join(repo, name, version, "pom.xml")
+        for name in os.listdir(repo)
+        for version in os.listdir(os.path.join(repo, name))
+    ]
+    graph = None
+
+    for phase in SUITE_PHASES:
+        if memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+
+        if phase == "read_pom":
+            for path in pom_paths:
+                pr2_5.read_pom(path)
+        elif phase == "bfs":
+            graph = pr2_5.build_dependency_graph_bfs("p0", "1.0", repo)
+        elif phase == "load_order":
+            pr2_5.compute_load_order("p0", "1.0", repo, graph=graph)
+        elif phase == "plantuml":
+            with open(os.path.join(out_dir, "graph.puml"), "w", encoding="utf-8") as f:
+                f.write(pr2_5.graph_to_plantuml(graph))
+        elif phase == "svg":
+            pr2_5.save_graph_as_svg(graph, os.path.join(out_dir, "graph.svg"), "p0:1.0")
+
+        result = {"time": time.perf_counter() - started}
+        if memory:
+            result["peak"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        results[phase] = result
+
+    results["graph"] = {"nodes": graph.node_count(), "edges": graph.edge_count()}
+    return results
+
+
+# дочерний процесс набора: этапы по готовому репозиторию, время или пик памяти каждого
+def bench_suite_child(args: argparse.Namespace):
+    with tempfile.TemporaryDirectory() as out_dir:
+        results = run_suite_phases(args.repo, out_dir, args.memory)
+    results["rss"] = {"peak": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+    print(json.dumps(results))
+
+
+# набор замеров по размерам репозитория: для каждого размера генерируется репозиторий,
+# затем в отдельных процессах время этапов (без tracemalloc, он замедляет) и пик памяти этапов
+def bench_suite(args: argparse.Namespace):
+    header = f"{'пакетов':>8} {'ребер':>8} {'этап':>11} {'время, с':>9} {'пик, МБ':>9}"
+    rows: list[dict] = []
+
+    for n_nodes in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            repo = os.path.join(tmp, "repo")
+            generate_repo(
+                repo, n_nodes, args.fanout, args.depth, args.cycle_density, args.padding, args.seed
+            )
+
+            measured = {}
+            for memory in (False, True):
+                command = [sys.executable, os.path.abspath(__file__), "suite_child", "--repo", repo]
+                if memory:
+                    command.append("--memory")
+                result = subprocess.run(command, check=True, capture_output=True, text=True)
+                measured[memory] = json.loads(result.stdout)
+
+        timing, peaks = measured[False], measured[True]
+        rows.append({
+            "packages": n_nodes,
+            "nodes": timing["graph"]["nodes"],
+            "edges": timing["graph"]["edges"],
+            "rss_peak": timing["rss"]["peak"],
+            "phases": {
+                phase: {"time": timing[phase]["time"], "peak": peaks[phase]["peak"]}
+                for phase in SUITE_PHASES
+            },
+        })
+
+        if not args.json:
+            if len(rows) == 1:
+                print(header)
+            row = rows[-1]
+            for phase, r in row["phases"].items():
+                print(
+                    f"{n_nodes:>8} {row['edges']:>8} {phase:>11} "
+                    f"{r['time']:>9.3f} {r['peak'] / 2**20:>9.1f}"
+                )
+            print(f"{n_nodes:>8} {row['edges']:>8} {'rss процесса':>11} {'':>9} {row['rss_peak'] / 2**20:>9.1f}")
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+
+
+def _add_repo_shape(p: argparse.ArgumentParser):
+    p.add_argument("--fanout", type=int, default=3, help="Зависимостей у пакета.")
+    p.add_argument("--depth", type=int, default=10, help="Число уровней графа.")
+    p.add_argument("--cycle_density", type=float, default=0.0, help="Доля пакетов с обратным ребром (цикл).")
+    p.add_argument("--padding", type=int, default=0, help="Объемных плагинов в каждом pom (размер pom).")
+    p.add_argument("--seed", type=int, default=1, help="Зерно генератора.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры производительности pr2_5.py.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("read_pom", help="Разбор больших pom.xml: прежний read_pom против потокового.")
+    p.add_argument("--number", type=int, default=20, help="Число вызовов в одном замере.")
+    p.set_defaults(func=bench_read_pom)
+
+    p = sub.add_parser("graph", help="Память графа: dict[str, list[str]] против CompactGraph.")
+    p.add_argument("--edges", type=int, default=1_000_000, help="Число ребер.")
+    p.add_argument("--fanout", type=int, default=10, help="Соседей у каждой вершины.")
+    p.set_defaults(func=bench_graph)
+
+    p = sub.add_parser("svg", help="Пиковый rss при записи svg: сборка строк в памяти, потоковая запись, новая раскладка.")
+    p.add_argument("--nodes", type=int, default=50_000, help="Число вершин.")
+    p.add_argument("--fanout", type=int, default=3, help="Соседей у каждой вершины.")
+    p.set_defaults(func=bench_svg)
+
+    p = sub.add_parser("gen", help="Сгенерировать синтетический репозиторий.")
+    p.add_argument("repo", help="Папка репозитория.")
+    p.add_argument("--nodes", type=int, default=1000, help="Число пакетов.")
+    _add_repo_shape(p)
+    p.set_defaults(func=bench_gen)
+
+    p = sub.add_parser("suite", help="Время и пик памяти этапов на синтетических репозиториях разного размера.")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="Размеры репозиториев.")
+    p.add_argument("--json", action="store_true", help="Вывести результаты в JSON.")
+    _add_repo_shape(p)
+    p.set_defaults(func=bench_suite)
+
+    p = sub.add_parser("suite_child")
+    p.add_argument("--repo", required=True)
+    p.add_argument("--memory", action="store_true")
+    p.set_defaults(func=bench_suite_child)
+
+    p = sub.add_parser("svg_child")
+    p.add_argument("--impl", choices=sorted(SVG_IMPLS), required=True)
+    p.add_argument("--nodes", type=int, required=True)
+    p.add_argument("--fanout", type=int, required=True)
+    p.add_argument("--out", required=True)
+    p.set_defaults(func=bench_svg_child)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
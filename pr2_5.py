@@ -1,15 +1,31 @@
 import argparse # для чтения аргументов
+import fnmatch # glob-шаблоны фильтра пакетов
+import gzip # сжатый svg (.svgz)
+import http.client # запросы к удаленному репозиторию
+import io # разбор скачанного pom из памяти
+import json # для хранения разобранных pom в кэше
 import os # для работы с путями/папками
+import queue # пул http-соединений
 import re  # для проверки формата версии
+import sqlite3 # постоянный кэш pom между запусками
 import sys # для кода выхода
-from urllib.parse import urlparse  # проверка на юрл
+import threading # защита кэша от параллельного доступа
+import time # метки последнего использования для LRU
+import tracemalloc # пик памяти для --stats
+from urllib.parse import quote, urlparse  # проверка на юрл
 import xml.etree.ElementTree as ET  # для разбора pom.xml
+from array import array # компактное хранение ребер графа
 from collections import deque  # очередь для BFS
+from collections.abc import Iterator, Mapping # граф только для чтения, ленивые обходы
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor # параллельная загрузка pom
+from contextlib import contextmanager, nullcontext, redirect_stdout # замер этапов, заглушка вместо пула, вывод корня в файл
+from itertools import islice # --why_all печатает не больше заданного числа путей
 
 
 # допустимые значения
 SUPPORTED_FORMATS = {"ascii"} # формат вывода аски
 SUPPORTED_MODES = {"test", "prod"}  # допустимые режимы. test prod
+SUPPORTED_JOBS_MODES = {"thread", "process"} # способы параллельной загрузки pom
 
 # проверка юрл или существующего пути
 def is_url_or_path(value: str) -> bool:
@@ -23,48 +39,1060 @@ def is_url_or_path(value: str) -> bool:
 
 
 
-# поиск зависимостей
-def read_pom(pom_path: str): # в мавен зависимости описаны в пом, открываем пом и достаем список <dependency>
-    
-    if not os.path.exists(pom_path):  # если файл нет
+# постоянный кэш разобранных pom.xml
+# ключ - абсолютный путь, запись действительна пока совпадают размер и mtime файла
+# хранится в sqlite: несколько запусков cli могут работать с одним файлом одновременно
+POM_CACHE_SCHEMA = 5 # меняется при изменении формата сохраняемых записей
+POM_CACHE_FLUSH_EVERY = 1000 # сколько изменений копим перед записью на диск
+
+
+class PomCache:
+    def __init__(self, db_path: str, max_entries: int = 100000):
+        self.db_path = db_path
+        self.max_entries = max_entries # ограничение размера, лишнее вытесняется по LRU
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._pending: dict[str, tuple[int, int, str]] = {} # новые записи путь - (размер, mtime, json)
+        self._touched: set[str] = set() # пути, для которых надо обновить время использования
+        self._flush_at = POM_CACHE_FLUSH_EVERY # после неудачной записи следующая попытка откладывается
+
+        # isolation_level=None - транзакции открываем сами
+        self._conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL") # читатели не блокируют писателя
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS poms ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+            "schema INTEGER, payload TEXT, used INTEGER)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS poms_used ON poms(used)")
+
+    def get(self, path: str, size: int, mtime_ns: int):
+        with self._lock:
+            pending = self._pending.get(path)
+            if pending is not None and pending[:2] == (size, mtime_ns):
+                self.hits += 1
+                return json.loads(pending[2])
+
+            # база занята или повреждена - считаем промахом, сборка графа продолжается
+            try:
+                row = self._conn.execute(
+                    "SELECT size, mtime_ns, schema, payload FROM poms WHERE path = ?", (path,)
+                ).fetchone()
+            except sqlite3.Error:
+                row = None
+
+            # запись устарела или сохранена в старом формате
+            if row is None or (row[0], row[1], row[2]) != (size, mtime_ns, POM_CACHE_SCHEMA):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._touched.add(path)
+            self._maybe_flush()
+            return json.loads(row[3])
+
+    def put(self, path: str, size: int, mtime_ns: int, value):
+        with self._lock:
+            self._pending[path] = (size, mtime_ns, json.dumps(value, ensure_ascii=False))
+            self._maybe_flush()
+
+    # запись посреди чтения не должна ронять запуск: если другой процесс дольше timeout держит
+    # блокировку, записи остаются в памяти до следующей попытки или close,
+    # а время использования просто не обновляется
+    def _maybe_flush(self):
+        size = len(self._pending) + len(self._touched)
+        if size < self._flush_at:
+            return
+        try:
+            self._flush()
+        except sqlite3.Error:
+            self._touched.clear()
+            self._flush_at = len(self._pending) + POM_CACHE_FLUSH_EVERY
+        else:
+            self._flush_at = POM_CACHE_FLUSH_EVERY
+
+    def _flush(self):
+        if not self._pending and not self._touched:
+            return
+        now = time.time_ns()
+
+        # BEGIN IMMEDIATE сразу берет блокировку на запись, другие процессы ждут timeout
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO poms (path, size, mtime_ns, schema, payload, used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(p, size, mtime, POM_CACHE_SCHEMA, payload, now)
+                 for p, (size, mtime, payload) in self._pending.items()]
+            )
+            self._conn.executemany(
+                "UPDATE poms SET used = ? WHERE path = ?",
+                [(now, p) for p in self._touched - self._pending.keys()]
+            )
+
+            # вытеснение давно не использованных записей
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM poms").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM poms WHERE path IN "
+                    "(SELECT path FROM poms ORDER BY used LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._conn.execute("COMMIT")
+        except sqlite3.Error:
+            self._conn.execute("ROLLBACK")
+            raise
+
+        self._pending.clear()
+        self._touched.clear()
+
+    # записать накопленное, не закрывая соединение
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            try:
+                self._flush()
+            finally:
+                self._conn.close()
+
+
+pom_cache: PomCache | None = None # включается параметром --pom_cache
+
+
+# поля зависимости, которые достаем из pom; те же поля у координат проекта и родителя
+DEPENDENCY_FIELDS = ("groupId", "artifactId", "version")
+# поля зависимости в <dependencies>; кроме них у зависимости есть "exclusions" -
+# список исключенных "groupId:artifactId" (допускается * вместо любой части)
+DEP_ENTRY_FIELDS = DEPENDENCY_FIELDS + ("scope", "optional")
+# поля записи <dependencyManagement>: scope=import и type=pom - импорт BOM
+MANAGED_FIELDS = DEPENDENCY_FIELDS + ("scope", "type")
+
+# области видимости maven; пустая scope означает compile
+SUPPORTED_SCOPES = ("compile", "provided", "runtime", "test", "system")
+# зависимости с такими областями нужны только самому пакету и не переходят к тем, кто от него зависит
+NON_TRANSITIVE_SCOPES = ("provided", "test")
+
+# модель одного pom.xml как он записан в файле:
+# {"project": координаты, "parent": координаты родителя или None,
+#  "properties": {имя: значение}, "dependencies": [зависимости],
+#  "managed": [записи dependencyManagement]}
+# координаты - словари с полями DEPENDENCY_FIELDS, зависимости - с DEP_ENTRY_FIELDS и exclusions,
+# записи managed - с MANAGED_FIELDS; значения без подстановки ${...}
+PomModel = dict
+
+# разделы pom, которые нужны только сборке: их содержимое пропускается без разбора
+POM_SKIPPED_SECTIONS = ("build", "reporting", "profiles")
+# разделы модели; порядок разделов в pom произвольный, поэтому дочитывать файл
+# не нужно, только когда все они и <dependencies> уже пройдены
+POM_MODEL_SECTIONS = ("parent", "properties", "dependencyManagement", "dependencies")
+
+
+# счетчики запуска для --stats: прочитанные и отсутствующие pom, байты, время этапов,
+# размер итогового графа и пик памяти. Время разбора суммируется по потокам
+class RunStats:
+    def __init__(self):
+        self.poms_read = 0 # разобрано pom (без попаданий в кэш и индекс)
+        self.poms_missing = 0 # pom не найден
+        self.bytes_read = 0
+        self.phases: dict[str, float] = {} # этап - секунды
+        self.graphs = 0 # построено графов (в пакетном режиме - по корню на граф)
+        self.nodes = 0
+        self.edges = 0
+        self.peak_memory = 0 # байт по tracemalloc
+        self._lock = threading.Lock()
+
+    def count_pom(self, size: int, seconds: float):
+        with self._lock:
+            self.poms_read += 1
+            self.bytes_read += size
+            self.phases["parse"] = self.phases.get("parse", 0.0) + seconds
+
+    def count_missing(self):
+        with self._lock:
+            self.poms_missing += 1
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def count_graph(self, graph: Mapping[str, list[str]]):
+        if isinstance(graph, CompactGraph):
+            nodes, edges = graph.node_count(), graph.edge_count()
+        else:
+            nodes = len(set(graph).union(*graph.values())) if graph else 0
+            edges = sum(len(neighbors) for neighbors in graph.values())
+        self.graphs += 1
+        self.nodes += nodes
+        self.edges += edges
+
+    # счетчики из другого процесса (to_dict обработчика пакетного режима): суммируются,
+    # пик памяти - наибольший по процессам
+    def merge(self, data: dict):
+        with self._lock:
+            for field in ("poms_read", "poms_missing", "bytes_read", "graphs", "nodes", "edges"):
+                setattr(self, field, getattr(self, field) + data[field])
+            for name, seconds in data["phases"].items():
+                self.phases[name] = self.phases.get(name, 0.0) + seconds
+            self.peak_memory = max(self.peak_memory, data["peak_memory"])
+
+    def to_dict(self) -> dict:
+        return {
+            "poms_read": self.poms_read,
+            "poms_missing": self.poms_missing,
+            "bytes_read": self.bytes_read,
+            "phases": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+            "graphs": self.graphs,
+            "nodes": self.nodes,
+            "edges": self.edges,
+            "peak_memory": self.peak_memory,
+        }
+
+
+run_stats: RunStats | None = None # включается параметром --stats
+
+
+def _stats_phase(name: str):
+    return run_stats.phase(name) if run_stats is not None else nullcontext()
+
+
+def _count_pom(size: int, started: float):
+    if run_stats is not None:
+        run_stats.count_pom(size, time.perf_counter() - started)
+
+
+def _count_missing():
+    if run_stats is not None:
+        run_stats.count_missing()
+
+
+# чтение pom: модель файла как есть (см. _parse_pom_stream), без учета родителей
+def read_pom(pom_path: str) -> PomModel | None:
+
+    st = _stat_pom(pom_path)
+    if st is None:  # если файл нет
+        _count_missing()
+        return None
+
+    model = _cache_get(pom_path, st)
+    if model is None:
+        started = time.perf_counter()
+        model = _parse_pom(pom_path)
+        _count_pom(st.st_size, started)
+        _cache_put(pom_path, st, model)
+    return model
+
+
+# размер и время изменения pom - ключ кэша, None если файла нет
+def _stat_pom(pom_path: str) -> os.stat_result | None:
+    try:
+        return os.stat(pom_path)
+    except OSError:
         return None
 
-    tree = ET.parse(pom_path) # разобрать пом в дерева элементов
-    root = tree.getroot()  # корневой
-    
 
-    # пространство имён Maven
-    ns = {"m": "http://maven.apache.org/POM/4.0.0"}
+def _cache_get(pom_path: str, st: os.stat_result):
+    if pom_cache is None:
+        return None
+    return pom_cache.get(os.path.abspath(pom_path), st.st_size, st.st_mtime_ns)
+
+
+def _cache_put(pom_path: str, st: os.stat_result, model: PomModel):
+    if pom_cache is not None:
+        pom_cache.put(os.path.abspath(pom_path), st.st_size, st.st_mtime_ns, model)
+
+
+# имя тега без пространства имен: {http://maven.apache.org/POM/4.0.0}version -> version
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+# разбор pom без кэша
+def _parse_pom(pom_path: str) -> PomModel:
+    with open(pom_path, "rb") as f:
+        return _parse_pom_stream(f)
+
+
+# потоковый разбор: дерево целиком не строится, прочитанные элементы сразу очищаются,
+# содержимое объемных разделов сборки (build, reporting, profiles) пропускается, а когда
+# все разделы модели уже прочитаны, остаток файла с первого такого раздела не читается
+def _parse_pom_stream(f) -> PomModel:
+    project = dict.fromkeys(DEPENDENCY_FIELDS, "") # координаты самого пакета
+    parent: dict[str, str] | None = None
+    properties: dict[str, str] = {}
+    deps: list[dict[str, str]] = []  # зависимости
+    managed: list[dict[str, str]] = [] # <dependencyManagement>/<dependencies>
+    current: dict | None = None # зависимость, которую сейчас читаем
+    current_fields: tuple[str, ...] = () # ее текстовые поля
+    current_depth = 0 # глубина ее элемента <dependency>
+    exclusion: dict[str, str] | None = None # <exclusion> текущей зависимости
+    depth = 0 # глубина текущего элемента, у <project> - 1
+    section = "" # раздел второго уровня, внутри которого находимся
+    subsection = "" # элемент третьего уровня внутри раздела
+    skipping = False # внутри раздела из POM_SKIPPED_SECTIONS
+    sections_read: set[str] = set() # пройденные разделы из POM_MODEL_SECTIONS
+
+    for event, elem in ET.iterparse(f, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if skipping:
+                continue
+            if depth == 2:
+                section = _local_name(elem.tag)
+                if section in POM_SKIPPED_SECTIONS:
+                    if len(sections_read) == len(POM_MODEL_SECTIONS):
+                        break # вся модель прочитана, дальше только настройки сборки
+                    skipping = True
+                if section == "parent":
+                    parent = dict.fromkeys(DEPENDENCY_FIELDS, "")
+            elif depth == 3:
+                subsection = _local_name(elem.tag)
+                if section == "dependencies" and subsection == "dependency":
+                    current, current_fields, current_depth = dict.fromkeys(DEP_ENTRY_FIELDS, ""), DEP_ENTRY_FIELDS, depth
+                    current["exclusions"] = []
+            elif (depth == 4 and section == "dependencyManagement" and subsection == "dependencies"
+                    and _local_name(elem.tag) == "dependency"):
+                current, current_fields, current_depth = dict.fromkeys(MANAGED_FIELDS, ""), MANAGED_FIELDS, depth
+            elif (current is not None and depth == current_depth + 2 and "exclusions" in current
+                    and _local_name(elem.tag) == "exclusion"):
+                exclusion = {"groupId": "", "artifactId": ""}
+            continue
+
+        # event == "end": текст элемента уже прочитан
+        if skipping and depth > 2:
+            pass # содержимое раздела сборки только освобождаем
+        elif exclusion is not None and depth == current_depth + 3:
+            tag = _local_name(elem.tag)
+            if tag in exclusion:
+                exclusion[tag] = (elem.text or "").strip()
+        elif exclusion is not None and depth == current_depth + 2:
+            current["exclusions"].append(f"{exclusion['groupId']}:{exclusion['artifactId']}")
+            exclusion = None
+        elif current is not None and depth == current_depth + 1:
+            tag = _local_name(elem.tag)
+            if tag in current_fields:
+                current[tag] = (elem.text or "").strip()
+        elif current is not None and depth == current_depth:
+            (deps if section == "dependencies" else managed).append(current)
+            current = None
+        elif depth == 3:
+            if section == "parent" and subsection in parent:
+                parent[subsection] = (elem.text or "").strip()
+            elif section == "properties":
+                properties[subsection] = (elem.text or "").strip()
+        elif depth == 2:
+            if section in project:
+                project[section] = (elem.text or "").strip()
+            elif section in POM_MODEL_SECTIONS:
+                sections_read.add(section)
+            section = ""
+            skipping = False
+
+        depth -= 1
+        if depth > 0:
+            elem.clear() # освобождаем память под разобранный элемент
+
+    return {
+        "project": project,
+        "parent": parent,
+        "properties": properties,
+        "dependencies": deps,
+        "managed": managed,
+    }
+
+
+# подстановка ${имя} из свойств; значение свойства само может ссылаться на свойства,
+# поэтому проходов несколько. Неизвестные и зацикленные ссылки остаются как есть
+PROPERTY_REF = re.compile(r"\$\{([^}]+)\}")
+POM_INTERPOLATION_DEPTH = 10
+
+
+def interpolate(value: str, properties: dict[str, str]) -> str:
+    for _ in range(POM_INTERPOLATION_DEPTH):
+        if "${" not in value:
+            break
+        new_value = PROPERTY_REF.sub(lambda m: properties.get(m.group(1), m.group(0)), value)
+        if new_value == value:
+            break
+        value = new_value
+    return value
+
+
+# эффективный pom: модель с учетом родителя. Свойства, зависимости и dependencyManagement
+# родителя наследуются (свои важнее), groupId и version без значения берутся у родителя.
+# Подстановка ${...} откладывается до resolve_dependencies: унаследованная зависимость
+# подставляет свойства потомка
+def effective_pom(model: PomModel, parent: PomModel | None) -> PomModel:
+    parent_ref = model["parent"]
+    project = dict(model["project"])
+    for field in ("groupId", "version"):
+        if not project[field] and parent_ref is not None:
+            project[field] = parent_ref[field]
+
+    properties = dict(parent["properties"]) if parent is not None else {}
+    properties.update(model["properties"])
+
+    deps = _inherit(model["dependencies"], parent["dependencies"] if parent is not None else [])
+    managed = _inherit(model["managed"], parent["managed"] if parent is not None else [])
+
+    return {
+        "project": project,
+        "parent": parent_ref,
+        "properties": properties,
+        "dependencies": deps,
+        "managed": managed,
+    }
+
+
+# свои записи и записи родителя с другими groupId:artifactId
+def _inherit(own: list[dict[str, str]], inherited: list[dict[str, str]]) -> list[dict[str, str]]:
+    if not inherited:
+        return own
+    keys = {(d["groupId"], d["artifactId"]) for d in own}
+    return own + [d for d in inherited if (d["groupId"], d["artifactId"]) not in keys]
+
+
+# свойства для подстановки в эффективный pom
+# встроенные project.* (и устаревшие pom.*) важнее свойств с тем же именем
+def effective_properties(effective: PomModel) -> dict[str, str]:
+    properties = dict(effective["properties"])
+    for prefix, coords in (("project.", effective["project"]), ("project.parent.", effective["parent"])):
+        if coords is None:
+            continue
+        for field in DEPENDENCY_FIELDS:
+            properties[prefix + field] = coords[field]
+    for field in DEPENDENCY_FIELDS:
+        properties["pom." + field] = effective["project"][field]
+    return properties
+
+
+# подстановка только в текстовые поля, список exclusions остается как есть
+def _interpolate_entries(entries: list[dict], properties: dict[str, str]) -> list[dict]:
+    return [
+        {k: interpolate(v, properties) if isinstance(v, str) else v for k, v in d.items()}
+        if any(isinstance(v, str) and "${" in v for v in d.values()) else d
+        for d in entries
+    ]
 
-    deps = []  # зависимости
 
-    # ищем раздел <dependencies>
-    for dep in root.findall("m:dependencies/m:dependency", ns):
-        # достаём значения полей dependency
-        group_id = dep.find("m:groupId", ns) # дочерний элемент
-        artifact_id = dep.find("m:artifactId", ns) # имя папки с пом
-        version = dep.find("m:version", ns) # папка версии
+# зависимости эффективного pom с подставленными свойствами;
+# зависимость без версии получает ее из managed - таблицы dependencyManagement (groupId, artifactId) - версия
+def resolve_dependencies(
+    effective: PomModel,
+    managed: dict[tuple[str, str], str] | None = None
+) -> list[dict[str, str]]:
+    deps = _interpolate_entries(effective["dependencies"], effective_properties(effective))
+    if not managed:
+        return deps
+    return apply_managed_versions(deps, managed)
+
+
+# версии из dependencyManagement для зависимостей, у которых своей версии нет
+def apply_managed_versions(
+    deps: list[dict[str, str]],
+    managed: dict[tuple[str, str], str]
+) -> list[dict[str, str]]:
+    return [
+        {**d, "version": managed.get((d["groupId"], d["artifactId"]), "")} if not d["version"] else d
+        for d in deps
+    ]
+
 
-        # приводим к строкам (или пустой строке если нет)
-        deps.append({
-            "groupId": group_id.text if group_id is not None else "",
-            "artifactId": artifact_id.text if artifact_id is not None else "",
-            "version": version.text if version is not None else ""
-        })
+# разобранные pom одного репозитория
+# каждый пакет (имя, версия) читается не больше одного раза за запуск,
+# поэтому прямые зависимости, граф и порядок загрузки строятся по одной модели.
+# Эффективные pom тоже запоминаются: общий родитель разбирается и сливается
+# со своими предками один раз, сколько бы потомков на него ни ссылалось
+class PomStore:
+    # можно ли выносить разбор pom в процессы (--jobs_mode process); хранилищам, которые
+    # ждут сеть или берут модели из памяти, пул процессов не нужен - для них сразу создаются потоки
+    parses_in_processes = True
+
+    def __init__(self, repo_path: str):
+        self.repo_path = repo_path
+        self._models: dict[tuple[str, str], PomModel | None] = {} # (имя, версия) - pom как в файле
+        self._effective: dict[tuple[str, str], PomModel | None] = {} # с учетом родителей
+        self._deps: dict[tuple[str, str], list[dict[str, str]] | None] = {} # (имя, версия) - зависимости
+        # таблицы версий dependencyManagement с раскрытыми импортами BOM - одна на pom за запуск,
+        # большой BOM разбирается один раз на весь обход, сколько бы пакетов его ни импортировало
+        self._management: dict[tuple[str, str], dict[tuple[str, str], str]] = {}
+
+    def pom_path(self, name: str, version: str, group: str = "") -> str:
+        return os.path.join(self.repo_path, name, version, "pom.xml")
+
+    # group нужен только удаленному репозиторию, в тестовом пакеты лежат по имени
+    def get(self, name: str, version: str, group: str = "") -> list[dict[str, str]] | None:
+        key = (name, version)
+        if key not in self._deps:
+            effective = self.effective(name, version, group)
+            if effective is None:
+                self._deps[key] = None
+            else:
+                deps = resolve_dependencies(effective)
+                # таблица версий нужна только зависимостям без <version>: иначе импортируемые
+                # BOM не загружаются вовсе (в удаленном режиме это лишние запросы)
+                if any(not d["version"] for d in deps):
+                    deps = apply_managed_versions(deps, self.management(name, version, group))
+                self._deps[key] = deps
+        return self._deps[key]
+
+    # таблица (groupId, artifactId) - версия из dependencyManagement эффективного pom:
+    # свои записи важнее импортированных, среди импортов BOM выигрывает первый.
+    # Пустая таблица заносится заранее, поэтому циклический импорт обрывается
+    def management(self, name: str, version: str, group: str = "") -> dict[tuple[str, str], str]:
+        key = (name, version)
+        if key in self._management:
+            return self._management[key]
+        self._management[key] = {}
+
+        table: dict[tuple[str, str], str] = {}
+        effective = self.effective(name, version, group)
+        if effective is not None:
+            imports = []
+            for entry in _interpolate_entries(effective["managed"], effective_properties(effective)):
+                if entry["scope"] == "import" and entry["type"] == "pom":
+                    imports.append(entry)
+                else:
+                    table.setdefault((entry["groupId"], entry["artifactId"]), entry["version"])
+
+            for bom in imports:
+                for managed_key, managed_version in self.management(
+                    bom["artifactId"], bom["version"], bom["groupId"]
+                ).items():
+                    table.setdefault(managed_key, managed_version)
+
+        self._management[key] = table
+        return table
+
+    def model(self, name: str, version: str, group: str = "") -> PomModel | None:
+        key = (name, version)
+        if key not in self._models:
+            self._models[key] = self._load(name, version, group)
+        return self._models[key]
+
+    # цепочка родителей поднимается до уже посчитанного предка (или до корня),
+    # затем эффективные pom считаются сверху вниз. Цикл родителей обрывается
+    def effective(self, name: str, version: str, group: str = "") -> PomModel | None:
+        chain: list[tuple[tuple[str, str], PomModel | None]] = []
+        seen: set[tuple[str, str]] = set()
+        key, coords = (name, version), (name, version, group)
+
+        while key not in self._effective and key not in seen:
+            seen.add(key)
+            model = self.model(*coords)
+            chain.append((key, model))
+            if model is None or model["parent"] is None:
+                break
+            ref = model["parent"]
+            key, coords = (ref["artifactId"], ref["version"]), (ref["artifactId"], ref["version"], ref["groupId"])
+
+        parent = self._effective.get(key)
+        for chain_key, model in reversed(chain):
+            parent = effective_pom(model, parent) if model is not None else None
+            self._effective[chain_key] = parent
+        return self._effective[(name, version)]
+
+    def _load(self, name: str, version: str, group: str) -> PomModel | None:
+        return read_pom(self.pom_path(name, version))
+
+    # параллельная загрузка пакетов одного уровня обхода, items - (имя, версия, группа)
+    # результат тот же, что у последовательных вызовов get; jobs - размер пула executor
+    def prefetch(self, items, executor: Executor, processes: bool = False, jobs: int = 1):
+        todo = list({item[:2]: item for item in items if item[:2] not in self._models}.values())
+        if not todo:
+            return
 
-    return deps  # возвращаем список зависимостей
+        if not processes:
+            for item, model in zip(todo, executor.map(lambda item: self._load(*item), todo)):
+                self._models[item[:2]] = model
+            return
 
+        # в дочерние процессы уходит только разбор xml,
+        # проверка файлов и работа с кэшем остаются в этом процессе
+        misses = []
+        for name, version, group in todo:
+            key = (name, version)
+            path = self.pom_path(name, version, group)
+            st = _stat_pom(path)
+            model = self._known(key, path, st) if st is not None else None
+            if st is None:
+                _count_missing()
+            if st is None or model is not None:
+                self._remember(key, st, model)
+            else:
+                misses.append((key, path, st))
+
+        # время разбора в процессах - общее время ожидания их результатов
+        started = time.perf_counter()
+        chunk = max(1, len(misses) // (jobs * 4))
+        parsed = executor.map(_parse_pom, [path for _, path, _ in misses], chunksize=chunk)
+        for (key, path, st), model in zip(misses, parsed):
+            _count_pom(st.st_size, started)
+            started = time.perf_counter()
+            _cache_put(path, st, model)
+            self._remember(key, st, model)
+
+    # модель, которую не нужно разбирать (для разбора в процессах): из кэша pom
+    def _known(self, key: tuple[str, str], path: str, st: os.stat_result) -> PomModel | None:
+        return _cache_get(path, st)
+
+    # модель, загруженная prefetch в процессах; st - None, если pom нет
+    def _remember(self, key: tuple[str, str], st: os.stat_result | None, model: PomModel | None):
+        self._models[key] = model
+
+    def close(self):
+        pass
+
+
+# удаленный maven-репозиторий: pom лежат по пути groupId/artifactId/version/artifactId-version.pom
+class RemotePomStore(PomStore):
+    parses_in_processes = False # загрузка по сети упирается в ожидание, а не в процессор
+
+    def __init__(self, repo_url: str, max_connections: int = 8):
+        super().__init__(repo_url)
+        self.fetcher = HttpPomFetcher(repo_url, max_connections)
+
+    def pom_path(self, name: str, version: str, group: str = "") -> str:
+        return self.fetcher.base_url + maven_pom_path(group, name, version)
+
+    def _load(self, name: str, version: str, group: str) -> PomModel | None:
+        if not group: # без groupId путь в репозитории не построить
+            return None
+
+        url = self.pom_path(name, version, group)
+        # опубликованные релизы не меняются, их можно брать из кэша без запроса
+        # snapshot-версии перезаливаются, их всегда скачиваем заново
+        immutable = not version.endswith("-SNAPSHOT")
+        if immutable and pom_cache is not None:
+            model = pom_cache.get(url, 0, 0)
+            if model is not None:
+                return model
+
+        try:
+            data = self.fetcher.get(maven_pom_path(group, name, version))
+        except (OSError, http.client.HTTPException) as e:
+            print(f"не удалось загрузить {url}: {e}")
+            return None
+        if data is None:
+            _count_missing()
+            return None
+
+        started = time.perf_counter()
+        try:
+            model = _parse_pom_stream(io.BytesIO(data))
+        except ET.ParseError as e: # вместо pom пришла html-страница или обрезанный ответ
+            print(f"не удалось разобрать {url}: {e}")
+            return None
+        _count_pom(len(data), started)
+        if immutable and pom_cache is not None:
+            pom_cache.put(url, 0, 0, model)
+        return model
+
+    def close(self):
+        self.fetcher.close()
+
+
+# путь к pom внутри maven-репозитория
+def maven_pom_path(group: str, name: str, version: str) -> str:
+    parts = group.split(".") + [name, version, f"{name}-{version}.pom"]
+    return "/" + "/".join(quote(part) for part in parts)
+
+
+# загрузка файлов из http-репозитория через пул keep-alive соединений
+# число одновременных запросов ограничено размером пула
+class HttpPomFetcher:
+    def __init__(self, base_url: str, max_connections: int = 8, timeout: float = 30):
+        p = urlparse(base_url)
+        self.base_url = base_url.rstrip("/")
+        self._scheme = p.scheme
+        self._host = p.hostname
+        self._port = p.port
+        self._base_path = p.path.rstrip("/")
+        self._timeout = timeout
+
+        self._slots = threading.BoundedSemaphore(max_connections) # не больше max_connections запросов сразу
+        self._idle: queue.LifoQueue = queue.LifoQueue() # свободные открытые соединения
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        self.requests = 0
+
+    def _connect(self) -> http.client.HTTPConnection:
+        with self._lock:
+            self.connections_opened += 1
+        if self._scheme == "https":
+            return http.client.HTTPSConnection(self._host, self._port, timeout=self._timeout)
+        return http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+
+    # содержимое файла или None, если его нет в репозитории
+    def get(self, path: str) -> bytes | None:
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+                reused = True
+            except queue.Empty:
+                conn = self._connect()
+                reused = False
 
-# поиск прямых завис
-def show_direct_dependens(path: str, name: str, version: str):
-    # конструируем путь к пом
-    pom_path = os.path.join( 
-        path,
-        name,
-        version,
-        "pom.xml"
+            try:
+                try:
+                    resp, data = self._request(conn, path)
+                except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                    if not reused:
+                        raise
+                    # сервер закрыл простаивавшее соединение - повторяем на новом
+                    conn.close()
+                    conn = self._connect()
+                    resp, data = self._request(conn, path)
+            except BaseException:
+                conn.close()
+                raise
+
+            if resp.will_close:
+                conn.close()
+            else:
+                self._idle.put(conn)
+
+        if resp.status == 404:
+            return None
+        if resp.status != 200:
+            raise OSError(f"HTTP {resp.status} {resp.reason}")
+        return data
+
+    def _request(self, conn: http.client.HTTPConnection, path: str):
+        with self._lock:
+            self.requests += 1
+        conn.request("GET", self._base_path + path)
+        resp = conn.getresponse()
+        return resp, resp.read() # тело читаем полностью, иначе соединение не переиспользовать
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+# хранилище pom для адреса репозитория: http(s) - удаленный maven, иначе локальная папка
+def open_pom_store(repo: str, max_connections: int = 8) -> PomStore:
+    if is_remote_repo(repo):
+        return RemotePomStore(repo, max_connections)
+    return PomStore(repo)
+
+
+def is_remote_repo(value: str) -> bool:
+    p = urlparse(value)
+    return p.scheme in ("http", "https") and bool(p.netloc)
+
+
+# индекс локального репозитория: все пакеты name/version/pom.xml и их модели
+# в одном файле, чтобы повторные запросы строили граф без разбора xml
+REPO_INDEX_SCHEMA = 5
+
+
+# (имя, версия) - (mtime, размер, модель pom)
+# отсутствующий pom записывается как MISSING_POM, чтобы заметить его появление
+RepoIndex = dict[tuple[str, str], tuple[int, int, PomModel | None]]
+MISSING_POM = (-1, -1, None)
+
+
+# модель в json: координаты и зависимости - списки значений в порядке DEPENDENCY_FIELDS
+def _model_to_json(model: PomModel) -> list:
+    parent = model["parent"]
+    return [
+        [model["project"][k] for k in DEPENDENCY_FIELDS],
+        [parent[k] for k in DEPENDENCY_FIELDS] if parent is not None else None,
+        model["properties"],
+        [[d[k] for k in DEP_ENTRY_FIELDS] + [d["exclusions"]] for d in model["dependencies"]],
+        [[d[k] for k in MANAGED_FIELDS] for d in model["managed"]],
+    ]
+
+
+def _model_from_json(row: list) -> PomModel:
+    project, parent, properties, deps, managed = row
+    return {
+        "project": dict(zip(DEPENDENCY_FIELDS, project)),
+        "parent": dict(zip(DEPENDENCY_FIELDS, parent)) if parent is not None else None,
+        "properties": properties,
+        "dependencies": [
+            {**dict(zip(DEP_ENTRY_FIELDS, d)), "exclusions": d[len(DEP_ENTRY_FIELDS)]} for d in deps
+        ],
+        "managed": [dict(zip(MANAGED_FIELDS, d)) for d in managed],
+    }
+
+
+def _index_to_json(index: RepoIndex) -> list:
+    return [
+        [name, version, mtime_ns, size, _model_to_json(model) if model is not None else None]
+        for (name, version), (mtime_ns, size, model) in sorted(index.items())
+    ]
+
+
+def _index_from_json(rows: list) -> RepoIndex:
+    index: RepoIndex = {}
+    for name, version, mtime_ns, size, model in rows:
+        index[(name, version)] = (mtime_ns, size, _model_from_json(model) if model is not None else None)
+    return index
+
+
+# json-файл с проверкой формата и репозитория, None если файла нет или он чужой
+def _load_json_for_repo(path: str, schema: int, repo_path: str) -> dict | None:
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("schema") != schema or data.get("repo") != os.path.abspath(repo_path):
+        return None
+    return data
+
+
+# пишем во временный файл и подменяем, чтобы читатели не увидели половину файла
+def _save_json_atomic(path: str, data: dict):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def load_repo_index(index_path: str, repo_path: str) -> RepoIndex:
+    # индекс другого репозитория или старого формата не используем
+    data = _load_json_for_repo(index_path, REPO_INDEX_SCHEMA, repo_path)
+    if data is None:
+        return {}
+    return _index_from_json(data["packages"])
+
+
+def save_repo_index(index_path: str, repo_path: str, index: RepoIndex):
+    _save_json_atomic(index_path, {
+        "schema": REPO_INDEX_SCHEMA,
+        "repo": os.path.abspath(repo_path),
+        "packages": _index_to_json(index),
+    })
+
+
+# обход репозитория и обновление индекса: разбираются только новые и измененные pom
+def build_repo_index(
+    repo_path: str,
+    index_path: str,
+    jobs: int = 1,
+    processes: bool = False
+) -> tuple[RepoIndex, int, int]:
+    old = load_repo_index(index_path, repo_path)
+    index: RepoIndex = {}
+    changed: list[tuple[tuple[str, str], str, os.stat_result]] = [] # что надо разобрать заново
+
+    for name_entry in os.scandir(repo_path):
+        if not name_entry.is_dir():
+            continue
+        for version_entry in os.scandir(name_entry.path):
+            if not version_entry.is_dir():
+                continue
+            pom_path = os.path.join(version_entry.path, "pom.xml")
+            st = _stat_pom(pom_path)
+            if st is None:
+                continue
+
+            key = (name_entry.name, version_entry.name)
+            entry = old.get(key)
+            if entry is not None and entry[:2] == (st.st_mtime_ns, st.st_size):
+                index[key] = entry
+            else:
+                changed.append((key, pom_path, st))
+
+    paths = [path for _, path, _ in changed]
+    with make_executor(jobs, processes) or nullcontext() as executor:
+        parsed = executor.map(_parse_pom, paths) if executor is not None else map(_parse_pom, paths)
+        for (key, _, st), model in zip(changed, parsed):
+            index[key] = (st.st_mtime_ns, st.st_size, model)
+
+    save_repo_index(index_path, repo_path, index)
+    removed = len(old.keys() - index.keys())
+    return index, len(changed), removed
+
+
+# хранилище, которое берет зависимости из индекса
+# устаревшие записи (pom изменился после построения индекса) читаются из файла как обычно
+# в loaded копится отпечаток каждого запрошенного pom - из него строится состояние для --state
+class IndexedPomStore(PomStore):
+    def __init__(self, repo_path: str, index: RepoIndex):
+        super().__init__(repo_path)
+        self.index = index
+        self.loaded: RepoIndex = {}
+        self.parsed = 0 # сколько pom пришлось разобрать заново
+        self._lock = threading.Lock() # parsed увеличивают потоки prefetch
+
+    # записи прошлой сборки (--state) дополняют индекс; свежесть каждой все равно
+    # проверяется по отпечатку при загрузке
+    def add_known(self, packages: RepoIndex):
+        for key, entry in packages.items():
+            self.index.setdefault(key, entry)
+
+    def _count_parsed(self):
+        with self._lock:
+            self.parsed += 1
+
+    def _load(self, name: str, version: str, group: str) -> PomModel | None:
+        key = (name, version)
+        path = self.pom_path(name, version)
+        st = _stat_pom(path) # отпечаток снимаем до чтения: правка во время разбора заметим в след раз
+        if st is None:
+            _count_missing()
+            self.loaded[key] = MISSING_POM
+            return None
+
+        entry = self.index.get(key)
+        if entry is None or entry[:2] != (st.st_mtime_ns, st.st_size):
+            self._count_parsed()
+            entry = (st.st_mtime_ns, st.st_size, read_pom(path))
+        self.loaded[key] = entry
+        return entry[2]
+
+    def _known(self, key: tuple[str, str], path: str, st: os.stat_result) -> PomModel | None:
+        entry = self.index.get(key)
+        if entry is not None and entry[:2] == (st.st_mtime_ns, st.st_size):
+            return entry[2]
+        self._count_parsed()
+        return super()._known(key, path, st)
+
+    def _remember(self, key: tuple[str, str], st: os.stat_result | None, model: PomModel | None):
+        super()._remember(key, st, model)
+        self.loaded[key] = (st.st_mtime_ns, st.st_size, model) if st is not None else MISSING_POM
+
+    # записи индекса уже в памяти, заранее загружаем только пакеты, которых в нем нет
+    def prefetch(self, items, executor: Executor, processes: bool = False, jobs: int = 1):
+        missing = [item for item in items if item[:2] not in self.index]
+        if missing:
+            super().prefetch(missing, executor, processes, jobs)
+
+
+# состояние прошлой сборки графа для инкрементальной пересборки (--state, --watch):
+# отпечатки всех прочитанных pom (и их родителей), их модели, параметры сборки, сам граф
+# и опущенные при выборе версий ребра
+GRAPH_STATE_SCHEMA = 7
+
+
+class GraphState:
+    def __init__(
+        self,
+        options: dict,
+        packages: RepoIndex,
+        graph: "CompactGraph",
+        omitted: list[tuple[str, str, str]] | None = None
+    ):
+        self.options = options # параметры, от которых зависит граф
+        self.packages = packages
+        self.graph = graph
+        self.omitted = omitted if omitted is not None else []
+
+
+def load_graph_state(state_path: str, repo_path: str) -> GraphState | None:
+    data = _load_json_for_repo(state_path, GRAPH_STATE_SCHEMA, repo_path)
+    if data is None:
+        return None
+    return GraphState(
+        data["options"],
+        _index_from_json(data["packages"]),
+        CompactGraph.from_dict(data["graph"]),
+        [tuple(edge) for edge in data["omitted"]]
     )
-    deps = read_pom(pom_path)  # результат чтения пом
+
+
+def save_graph_state(state_path: str, repo_path: str, state: GraphState):
+    _save_json_atomic(state_path, {
+        "schema": GRAPH_STATE_SCHEMA,
+        "repo": os.path.abspath(repo_path),
+        "options": state.options,
+        "packages": _index_to_json(state.packages),
+        "graph": state.graph.to_dict(),
+        "omitted": state.omitted,
+    })
+
+
+# прочитанные в прошлый раз pom, которые с тех пор изменились, появились или пропали
+def changed_packages(repo_path: str, packages: RepoIndex) -> list[tuple[str, str]]:
+    changed = []
+    for (name, version), (mtime_ns, size, _) in packages.items():
+        st = _stat_pom(os.path.join(repo_path, name, version, "pom.xml"))
+        fingerprint = (st.st_mtime_ns, st.st_size) if st is not None else MISSING_POM[:2]
+        if fingerprint != (mtime_ns, size):
+            changed.append((name, version))
+    return changed
+
+
+# инкрементальная сборка: если ни один прочитанный pom не изменился, граф берется из состояния
+# как есть; иначе заново разбираются только измененные pom, а обход идет по данным в памяти.
+# Обход при этом проходит весь граф: исключения накапливаются на пути от корня, а выбор версий
+# зависит от порядка уровней, так что ребра неизмененного пакета могут поменяться из-за правки
+# его предка. Инкрементален разбор, а не обход - обход по моделям в памяти дешев.
+# store - общее хранилище запуска: оно дополняется пакетами прошлого состояния
+def build_dependency_graph_incremental(
+    start_name: str,
+    start_version: str,
+    repo_path: str,
+    packet_filter: "str | PackageFilter | None" = None,
+    previous: GraphState | None = None,
+    jobs: int = 1,
+    start_group: str = "",
+    mediate: bool = False,
+    scopes: frozenset[str] | None = None,
+    store: IndexedPomStore | None = None,
+    processes: bool = False
+) -> tuple[GraphState, int]:
+    options = {
+        "root": [start_name, start_version, start_group],
+        "packet_filter": _filter_option(packet_filter),
+        "mediate": mediate,
+        "scopes": sorted(scopes) if scopes is not None else None,
+    }
+
+    if (previous is not None and previous.options == options
+            and not changed_packages(repo_path, previous.packages)):
+        return previous, 0
+
+    if store is None:
+        store = IndexedPomStore(repo_path, {})
+    if previous is not None:
+        store.add_known(previous.packages)
+    parsed_before = store.parsed
+    omitted: list[tuple[str, str, str]] = []
+    graph = build_dependency_graph_bfs(
+        start_name, start_version, repo_path, packet_filter, store, jobs, processes,
+        start_group=start_group, mediate=mediate, omitted=omitted, scopes=scopes
+    )
+    return GraphState(options, store.loaded, graph, omitted), store.parsed - parsed_before
+
+
+# пул потоков или процессов для параллельного обхода, None - последовательно
+def make_executor(jobs: int, processes: bool = False) -> Executor | None:
+    if jobs <= 1:
+        return None
+    if processes:
+        return ProcessPoolExecutor(max_workers=jobs)
+    return ThreadPoolExecutor(max_workers=jobs)
+
+
+# поиск прямых завис
+def show_direct_dependens(
+    path: str,
+    name: str,
+    version: str,
+    store: PomStore | None = None,
+    group: str = ""
+):
+    if store is None:
+        store = open_pom_store(path)
+    deps = store.get(name, version, group)  # результат чтения пом
 
     if deps is None:  # списка нет
         print("невозможно загрузить зависимости")
@@ -75,7 +1103,9 @@ def show_direct_dependens(path: str, name: str, version: str):
 
     # вывод зависимостей
     for i in deps:
-        print(f"- {i['groupId']}:{i['artifactId']}:{i['version']}")
+        notes = [note for note in (i["scope"], "optional" if i["optional"] == "true" else "") if note]
+        suffix = f" ({', '.join(notes)})" if notes else ""
+        print(f"- {i['groupId']}:{i['artifactId']}:{i['version']}{suffix}")
 
 
 
@@ -85,115 +1115,653 @@ def show_direct_dependens(path: str, name: str, version: str):
 
 # пострроение графа зависимостей обходом в ширину
 
-def build_dependency_graph_bfs(start_name: str, start_version: str, repo_path: str, packet_filter: str | None = None):
-    graph: dict[str, list[str]] = {}
-    visited: set[tuple[str, str]] = set() # множество посещенных пакетов
+def build_dependency_graph_bfs(
+    start_name: str,
+    start_version: str,
+    repo_path: str,
+    packet_filter: "str | PackageFilter | None" = None,
+    store: PomStore | None = None,
+    jobs: int = 1,
+    processes: bool = False,
+    start_group: str = "",
+    mediate: bool = False,
+    omitted: list[tuple[str, str, str]] | None = None,
+    scopes: frozenset[str] | None = None
+):
+    if store is None:
+        store = open_pom_store(repo_path)
+
+    processes = processes and store.parses_in_processes
+    with make_executor(jobs, processes) or nullcontext() as executor:
+        return _bfs(
+            start_name, start_version, start_group, store, packet_filter, executor, processes,
+            mediate, omitted, scopes, jobs
+        )
+
+
+# обход по уровням: все пакеты текущего уровня можно загрузить параллельно,
+# а разбираем их в том же порядке, что и обычный bfs, поэтому граф совпадает.
+# mediate - выбор версий как в maven (побеждает ближайшая): уровни идут по глубине,
+# а внутри уровня - в порядке объявления, поэтому первая встреченная версия пакета и есть
+# ближайшая. Ребро на другую версию ведет к выбранной, проигравшая версия не загружается
+# и не раскрывается, а ребро записывается в omitted как (откуда, проигравшая, выбранная)
+def _bfs(
+    start_name: str,
+    start_version: str,
+    start_group: str,
+    store: PomStore,
+    packet_filter: "str | PackageFilter | None",
+    executor: Executor | None,
+    processes: bool,
+    mediate: bool = False,
+    omitted: list[tuple[str, str, str]] | None = None,
+    scopes: frozenset[str] | None = None,
+    jobs: int = 1
+) -> "CompactGraph":
+
+    # номер вершины в графе заодно отмечает ее как посещенную
+    graph = CompactGraph()
 
     # двусторонняя очередь для бфс, доб в конец извл из начала
+    # в элементе еще исключения, накопленные на пути от корня (exclusions),
+    # и действующая область видимости пакета (у корня None)
     q = deque()
 
     # ддоб в пакет корень
-    q.append((start_name, start_version))
-    visited.add((start_name, start_version))
+    q.append((start_name, start_version, start_group, frozenset(), None)) # группа нужна для адреса pom в удаленном репозитории
+    graph.intern(f"{start_name}:{start_version}")
+
+    # имя пакета - выбранная версия; пакеты, как и в хранилище, различаются по имени
+    chosen: dict[str, str] | None = {start_name: start_version} if mediate else None
 
     while q:
-        name, version = q.popleft() # сначала первый эл очереди
-        node_key = f"{name}:{version}"
+        # в очереди сейчас ровно один уровень обхода
+        if executor is not None:
+            store.prefetch([item[:3] for item in q], executor, processes, jobs)
 
-        # если вершинае сть в словаре ничего не меняем
-        # для вершин без детей
-        graph.setdefault(node_key, [])
+        for _ in range(len(q)):
+            name, version, group, exclusions, scope = q.popleft() # сначала первый эл очереди
+            node_id = graph.ids[f"{name}:{version}"]
+            neighbors: list[int] = [] # номера соседей тек вершины
 
-        # путь к пом
-        pom_path = os.path.join(repo_path, name, version, "pom.xml")
-        deps = read_pom(pom_path)
+            # зависимости из общего хранилища pom
+            deps = store.get(name, version, group)
 
-        if deps is None: # если пом не найден 
-            continue
+            if deps is None: # если пом не найден
+                graph.add_row(node_id, neighbors) # вершина без детей
+                continue
 
-        for dep in deps:
-            dep_name = dep["artifactId"]
-            dep_version = dep["version"]
+            for dep, dep_scope in _allowed_deps(deps, scope, packet_filter, scopes, exclusions):
+                dep_name = dep["artifactId"]
+                dep_version = dep["version"]
 
-            if not dep_name:# зависимость без имени
-                continue
+                # другая версия уже выбранного пакета - ребро к выбранной
+                if chosen is not None and dep_version:
+                    winner = chosen.setdefault(dep_name, dep_version)
+                    if winner != dep_version:
+                        if omitted is not None:
+                            omitted.append((f"{name}:{version}", f"{dep_name}:{dep_version}", f"{dep_name}:{winner}"))
+                        dep_version = winner
+
+                # строка для соседа
+                neighbor_key = f"{dep_name}:{dep_version}" if dep_version else dep_name
+                neighbor_id = graph.ids.get(neighbor_key)
+
+                # защита от циклов
+                if neighbor_id is None:
+                    neighbor_id = graph.intern(neighbor_key)
+                    if dep_version:
+                        q.append((
+                            dep_name, dep_version, dep["groupId"], _child_exclusions(exclusions, dep), dep_scope
+                        ))
+                neighbors.append(neighbor_id)
+
+            graph.add_row(node_id, neighbors)
 
-            # фильтр по подстроке
-            if packet_filter and packet_filter in dep_name:
-                continue
+    return graph
 
-            # строка для соседа
-            neighbor_key = f"{dep_name}:{dep_version}" if dep_version else dep_name
-            graph[node_key].append(neighbor_key)
 
-            state = (dep_name, dep_version)
-            # защита от циклов
-            if state not in visited:
-                visited.add(state)
-                if dep_version:
-                    q.append(state)
+# фильтр пакетов из многих шаблонов (--filter_file). Строка файла - один шаблон:
+#   groupId:artifactId или artifactId - точное имя или glob (*, ?, [...])
+#   re:выражение - регулярное выражение на всю строку "groupId:artifactId"
+# Шаблон исключает пакет; с префиксом + - разрешает: если есть разрешающие шаблоны,
+# проходят только подходящие под них пакеты. Исключение важнее разрешения.
+# Точные имена проверяются по множествам, остальные шаблоны каждого вида собраны
+# в одно регулярное выражение, а решение по пакету запоминается - цена проверки
+# не растет с числом шаблонов
+class PackageFilter:
+    def __init__(self, patterns: list[str]):
+        self.patterns = list(patterns) # исходные строки, по ним сравниваются параметры сборки
+        self._exclude = _PatternSet()
+        self._include = _PatternSet()
+        for pattern in self.patterns:
+            if pattern.startswith("+"):
+                self._include.add(pattern[1:])
+            else:
+                self._exclude.add(pattern)
+        self._exclude.compile()
+        self._include.compile()
+        self._decisions: dict[tuple[str, str], bool] = {} # (groupId, artifactId) - исключен
+
+    # шаблоны из файла, пустые строки и # - комментарии; substring - прежний --packet_filter
+    @classmethod
+    def from_file(cls, path: str, substring: str | None = None) -> "PackageFilter":
+        with open(path, encoding="utf-8") as f:
+            patterns = [line.strip() for line in f]
+        patterns = [p for p in patterns if p and not p.startswith("#")]
+        if substring:
+            patterns.append(f"re:[^:]*:.*{re.escape(substring)}.*")
+        return cls(patterns)
+
+    def excludes(self, group: str, name: str) -> bool:
+        key = (group, name)
+        decision = self._decisions.get(key)
+        if decision is None:
+            decision = self._exclude.matches(group, name) or (
+                not self._include.empty and not self._include.matches(group, name)
+            )
+            self._decisions[key] = decision
+        return decision
+
+
+# шаблоны одного вида: точные groupId:artifactId и artifactId в множествах,
+# glob и re: - одно регулярное выражение на всю строку "groupId:artifactId"
+class _PatternSet:
+    def __init__(self):
+        self.full: set[str] = set()
+        self.names: set[str] = set()
+        self.parts: list[str] = []
+        self.regex: re.Pattern | None = None
+
+    @property
+    def empty(self) -> bool:
+        return not (self.full or self.names or self.parts)
+
+    def add(self, pattern: str):
+        if pattern.startswith("re:"):
+            re.compile(pattern[3:]) # ошибка в выражении - сразу, с понятным текстом
+            self.parts.append(pattern[3:])
+        elif not any(c in pattern for c in "*?["):
+            (self.full if ":" in pattern else self.names).add(pattern)
+        elif ":" in pattern:
+            self.parts.append(fnmatch.translate(pattern))
+        else:
+            self.parts.append("[^:]*:" + fnmatch.translate(pattern))
+
+    def compile(self):
+        if self.parts:
+            self.regex = re.compile("|".join(f"(?:{part})" for part in self.parts))
+
+    def matches(self, group: str, name: str) -> bool:
+        subject = f"{group}:{name}"
+        return (
+            subject in self.full
+            or name in self.names
+            or (self.regex is not None and self.regex.fullmatch(subject) is not None)
+        )
 
-    return graph
+
+# фильтр обхода: подстрока из --packet_filter или PackageFilter; True - пакет отбрасывается
+def _filtered_out(packet_filter: "str | PackageFilter | None", group: str, name: str) -> bool:
+    if not packet_filter:
+        return False
+    if isinstance(packet_filter, PackageFilter):
+        return packet_filter.excludes(group, name)
+    return packet_filter in name
+
+
+# параметр фильтра для сравнения сборок в файле состояния
+def _filter_option(packet_filter: "str | PackageFilter | None"):
+    if isinstance(packet_filter, PackageFilter):
+        return packet_filter.patterns
+    return packet_filter
+
+
+# зависимости пакета, ребра к которым остаются в графе. Все отсечения - до загрузки pom:
+# зависимость без имени, фильтр пакетов, не та область видимости, необязательная
+# или test/provided зависимость не корня, исключение на пути от корня
+# scope - действующая область видимости пакета, чьи это зависимости (у корня None);
+# вместе с зависимостью выдается ее действующая область видимости
+def _allowed_deps(
+    deps: list[dict],
+    scope: str | None,
+    packet_filter: "str | PackageFilter | None",
+    scopes: frozenset[str] | None,
+    exclusions: frozenset[str]
+) -> Iterator[tuple[dict, str]]:
+    for dep in deps:
+        if not dep["artifactId"]: # зависимость без имени
+            continue
+        if _filtered_out(packet_filter, dep["groupId"], dep["artifactId"]):
+            continue
+        dep_scope = _edge_scope(dep, scope, scopes, exclusions)
+        if dep_scope is None:
+            continue
+        yield dep, dep_scope
+
+
+# исключения для поддерева зависимости: накопленные на пути и ее собственные
+def _child_exclusions(exclusions: frozenset[str], dep: dict) -> frozenset[str]:
+    return exclusions.union(dep["exclusions"]) if dep["exclusions"] else exclusions
+
+
+# действующая область видимости зависимости, если ребро проходит по правилам maven, иначе None;
+# --scopes (scopes, None - любые) сравнивается именно с ней, а не с объявленной в pom
+def _edge_scope(
+    dep: dict,
+    scope: str | None,
+    scopes: frozenset[str] | None,
+    exclusions: frozenset[str]
+) -> str | None:
+    declared = dep["scope"] or "compile"
+    if scope is not None and (declared in NON_TRANSITIVE_SCOPES or dep["optional"] == "true"):
+        return None
+    effective = propagate_scope(scope, declared)
+    if scopes is not None and effective not in scopes:
+        return None
+    if exclusions:
+        group, name = dep["groupId"], dep["artifactId"]
+        for pattern in (f"{group}:{name}", f"*:{name}", f"{group}:*", "*:*"):
+            if pattern in exclusions:
+                return None
+    return effective
+
+
+# таблица распространения областей видимости maven: транзитивная зависимость пакета
+# в provided, test или system получает его область видимости, compile в runtime-пакете
+# становится runtime, в остальных случаях остается объявленная. parent None - зависимость корня
+def propagate_scope(parent: str | None, declared: str) -> str:
+    if parent is None or parent == "compile":
+        return declared
+    if parent == "runtime":
+        return "runtime" if declared == "compile" else declared
+    return parent
+
+
+# ленивый граф зависимостей для библиотечных вызовов: pom пакета читается только тогда,
+# когда впервые запрошены его соседи. Правила ребер те же, что у build_dependency_graph_bfs
+# (фильтр, области видимости, optional, исключения); исключения берутся с пути, по которому
+# пакет найден впервые, как и действующая область видимости. Выбора версий (mediate) нет - он требует полного обхода по уровням.
+# Как Mapping граф годится для кода вывода, но перебор ключей и len раскрывают его целиком;
+# обходы bfs/dfs/find/path_to - итераторы и останавливаются, как только результат найден
+class DependencyGraph(Mapping):
+    def __init__(
+        self,
+        root_name: str,
+        root_version: str,
+        store: PomStore,
+        packet_filter: "str | PackageFilter | None" = None,
+        scopes: frozenset[str] | None = None,
+        root_group: str = ""
+    ):
+        self.store = store
+        self.packet_filter = packet_filter
+        self.scopes = scopes
+        self.root = f"{root_name}:{root_version}"
+        # найденные узлы: (имя, версия, группа, исключения, действующая область видимости)
+        # или None у пакета без версии - у него нет pom
+        self._found: dict[str, tuple[str, str, str, frozenset[str], str | None] | None] = {
+            self.root: (root_name, root_version, root_group, frozenset(), None)
+        }
+        self._neighbors: dict[str, list[str]] = {} # раскрытые узлы
+
+    # соседи узла; при первом запросе читается pom
+    def neighbors(self, node: str) -> list[str]:
+        result = self._neighbors.get(node)
+        if result is not None:
+            return result
+        if node not in self._found:
+            raise KeyError(node)
+
+        result = []
+        info = self._found[node]
+        deps = self.store.get(*info[:3]) if info is not None else None
+        if deps is not None:
+            name, version, group, exclusions, scope = info
+            for dep, dep_scope in _allowed_deps(deps, scope, self.packet_filter, self.scopes, exclusions):
+                dep_name, dep_version = dep["artifactId"], dep["version"]
+                key = f"{dep_name}:{dep_version}" if dep_version else dep_name
+                if key not in self._found:
+                    self._found[key] = (
+                        (dep_name, dep_version, dep["groupId"], _child_exclusions(exclusions, dep), dep_scope)
+                        if dep_version else None
+                    )
+                result.append(key)
+
+        self._neighbors[node] = result
+        return result
+
+    def expanded(self) -> int: # сколько узлов раскрыто
+        return len(self._neighbors)
+
+    # обход в ширину: (узел, глубина); соседи узла читаются, только когда обход до них дошел
+    def bfs(self, max_depth: int | None = None) -> Iterator[tuple[str, int]]:
+        seen = {self.root}
+        q = deque([(self.root, 0)])
+        while q:
+            node, depth = q.popleft()
+            yield node, depth
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for n in self.neighbors(node):
+                if n not in seen:
+                    seen.add(n)
+                    q.append((n, depth + 1))
+
+    # обход в глубину в прямом порядке, без рекурсии
+    def dfs(self) -> Iterator[str]:
+        seen = {self.root}
+        yield self.root
+        stack = [iter(self.neighbors(self.root))]
+        while stack:
+            for n in stack[-1]:
+                if n not in seen:
+                    seen.add(n)
+                    yield n
+                    stack.append(iter(self.neighbors(n)))
+                    break
+            else:
+                stack.pop()
+
+    # ближайший к корню узел пакета: target - "имя" (любая версия) или "имя:версия"
+    def find(self, target: str) -> str | None:
+        for node, _ in self.bfs():
+            if _node_matches(node, target):
+                return node
+        return None
+
+    def reachable(self, target: str) -> bool:
+        return self.find(target) is not None
+
+    # кратчайший путь от корня до пакета или None; обход останавливается на первой находке
+    def path_to(self, target: str) -> list[str] | None:
+        parent: dict[str, str | None] = {self.root: None}
+        found = self.root if _node_matches(self.root, target) else None
+        q = deque([self.root])
+        while q and found is None:
+            node = q.popleft()
+            for n in self.neighbors(node):
+                if n not in parent:
+                    parent[n] = node
+                    if _node_matches(n, target): # проверка при обнаружении: соседей пакета не читаем
+                        found = n
+                        break
+                    q.append(n)
+        if found is None:
+            return None
+
+        path = []
+        while found is not None:
+            path.append(found)
+            found = parent[found]
+        return path[::-1]
+
+    # все кратчайшие пути от корня до пакета: обход идет по уровням и останавливается на уровне,
+    # где пакет впервые встретился (сам этот уровень не раскрывается); у каждого узла
+    # запоминаются все его предки с предыдущего уровня, пути собираются от пакета к корню
+    def shortest_paths(self, target: str) -> Iterator[list[str]]:
+        parents: dict[str, list[str]] = {self.root: []}
+        depth = {self.root: 0}
+        level = [self.root]
+        d = 0
+        found: list[str] = []
+        while level:
+            found = [node for node in level if _node_matches(node, target)]
+            if found:
+                break
+            next_level = []
+            for node in level:
+                for n in self.neighbors(node):
+                    if n not in depth:
+                        depth[n] = d + 1
+                        parents[n] = [node]
+                        next_level.append(n)
+                    elif depth[n] == d + 1 and parents[n][-1] != node:
+                        parents[n].append(node)
+            level = next_level
+            d += 1
+
+        for end in found:
+            stack = [(end, [end])]
+            while stack:
+                node, path = stack.pop()
+                if node == self.root:
+                    yield path[::-1]
+                    continue
+                for p in reversed(parents[node]):
+                    stack.append((p, path + [p]))
+
+    # Mapping: узлы в порядке обхода в ширину
+    def __getitem__(self, node: str) -> list[str]:
+        return self.neighbors(node)
+
+    def __iter__(self) -> Iterator[str]:
+        return (node for node, _ in self.bfs())
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.bfs())
+
+    def __contains__(self, node) -> bool:
+        if node in self._found:
+            return True
+        return any(n == node for n, _ in self.bfs())
+
+
+# узел "имя:версия" (или "имя" без версии) подходит под "имя" или "имя:версия"
+def _node_matches(node: str, target: str) -> bool:
+    return node == target or node.split(":", 1)[0] == target
+
+
+# граф зависимостей с пронумерованными вершинами
+# строка "имя:версия" хранится один раз, ребра - номера в массивах (CSR):
+# соседи строки r лежат в targets[offsets[r]:offsets[r + 1]]
+# для plantuml, svg, ascii-дерева и прочего кода граф выглядит как dict[str, list[str]] только для чтения
+class CompactGraph(Mapping):
+    def __init__(self):
+        self.names: list[str] = [] # номер - "имя:версия"
+        self.ids: dict[str, int] = {} # "имя:версия" - номер
+        self.rows = array("i") # вершины со своим списком соседей в порядке добавления
+        self.row_of = array("i") # номер вершины - номер ее строки или -1
+        self.offsets = array("i", [0])
+        self.targets = array("i")
+
+    # номер вершины, новая вершина получает следующий
+    def intern(self, key: str) -> int:
+        node_id = self.ids.get(key)
+        if node_id is None:
+            node_id = len(self.names)
+            self.ids[key] = node_id
+            self.names.append(key)
+            self.row_of.append(-1)
+        return node_id
+
+    # строки добавляются по одной, соседи вершины идут подряд
+    def add_row(self, node_id: int, neighbors: list[int]):
+        self.row_of[node_id] = len(self.rows)
+        self.rows.append(node_id)
+        self.targets.extend(neighbors)
+        self.offsets.append(len(self.targets))
+
+    def has_row(self, node_id: int) -> bool:
+        return self.row_of[node_id] >= 0
+
+    # границы списка соседей вершины в targets
+    def edge_range(self, node_id: int) -> tuple[int, int]:
+        row = self.row_of[node_id]
+        if row < 0:
+            return 0, 0
+        return self.offsets[row], self.offsets[row + 1]
+
+    # массивы графа для сохранения в json
+    def to_dict(self) -> dict:
+        return {
+            "names": self.names,
+            "rows": self.rows.tolist(),
+            "offsets": self.offsets.tolist(),
+            "targets": self.targets.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CompactGraph":
+        graph = cls()
+        for name in data["names"]:
+            graph.intern(name)
+        graph.rows = array("i", data["rows"])
+        graph.offsets = array("i", data["offsets"])
+        graph.targets = array("i", data["targets"])
+        for row, node_id in enumerate(graph.rows):
+            graph.row_of[node_id] = row
+        return graph
+
+    # любой граф dict[str, list[str]] в компактном виде, порядок строк сохраняется
+    @classmethod
+    def from_mapping(cls, graph: Mapping[str, list[str]]) -> "CompactGraph":
+        if isinstance(graph, CompactGraph):
+            return graph
+        compact = cls()
+        for node in graph:
+            compact.intern(node)
+        for node, neighbors in graph.items():
+            compact.add_row(compact.ids[node], [compact.intern(n) for n in neighbors])
+        return compact
+
+    # соседи без копирования
+    def neighbor_ids(self, node_id: int) -> memoryview:
+        row = self.row_of[node_id]
+        if row < 0:
+            return memoryview(self.targets)[0:0]
+        return memoryview(self.targets)[self.offsets[row]:self.offsets[row + 1]]
+
+    def node_count(self) -> int:
+        return len(self.names)
+
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def __getitem__(self, key: str) -> list[str]:
+        node_id = self.ids.get(key)
+        if node_id is None or self.row_of[node_id] < 0:
+            raise KeyError(key)
+        row = self.row_of[node_id]
+        names = self.names
+        return [names[t] for t in self.targets[self.offsets[row]:self.offsets[row + 1]]]
+
+    def __iter__(self):
+        names = self.names
+        return (names[node_id] for node_id in self.rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, key) -> bool:
+        node_id = self.ids.get(key)
+        return node_id is not None and self.row_of[node_id] >= 0
 
 
 # порядок загрузки зависимостей
+# строится по уже построенному графу, повторно pom не читаются
 def compute_load_order(
     start_name: str,
     start_version: str,
     repo_path: str,
-    packet_filter: str | None = None
+    packet_filter: "str | PackageFilter | None" = None,
+    store: PomStore | None = None,
+    graph: Mapping[str, list[str]] | None = None,
+    jobs: int = 1,
+    processes: bool = False,
+    start_group: str = "",
+    broken_edges: list[tuple[str, str]] | None = None
 ) -> list[str]:
 
+    if graph is None:
+        graph = build_dependency_graph_bfs(
+            start_name, start_version, repo_path, packet_filter, store, jobs, processes, start_group
+        )
 
-    visited: set[tuple[str, str]] = set()  # уже обработанные пакеты
-    temp_mark: set[tuple[str, str]] = set()    # для циклов
-    order: list[str] = [] 
+    return load_order_from_graph(graph, f"{start_name}:{start_version}", broken_edges)
 
-    def dfs(name: str, version: str | None):
-        state = (name, version) # вершина
 
-        # обнаружение цикла
-        if state in temp_mark:
-            return
+# обход в глубину без рекурсии: пакет попадает в порядок после всех своих зависимостей
+# порядок тот же, что у рекурсивного обхода; ребра, замыкающие цикл, пропускаются
+# и, если передан broken_edges, записываются туда парами (пакет, зависимость)
+def load_order_from_graph(
+    graph: Mapping[str, list[str]],
+    root: str,
+    broken_edges: list[tuple[str, str]] | None = None
+) -> list[str]:
+    if isinstance(graph, CompactGraph):
+        return _load_order_compact(graph, root, broken_edges)
 
-        # уже обработан
-        if state in visited:
-            return
+    visited: set[str] = set()  # уже обработанные пакеты
+    temp_mark: set[str] = {root}    # пакеты на текущем пути обхода, для циклов
+    order: list[str] = []
 
-        temp_mark.add(state)
+    # стек вместо рекурсии: вершина и итератор по ее еще не просмотренным детям
+    # пакет без pom или без версии в графе без детей - это лист
+    stack = [(root, iter(graph.get(root, ())))]
 
-        # путь к пом текущего пакета
-        if version:
-            pom_path = os.path.join(repo_path, name, version, "pom.xml")
-        else:
-            pom_path = ""
+    while stack:
+        node, children = stack[-1]
 
-        deps = read_pom(pom_path) if pom_path and os.path.exists(pom_path) else None
+        for child in children:
+            # обнаружение цикла
+            if child in temp_mark:
+                if broken_edges is not None:
+                    broken_edges.append((node, child))
+                continue
 
-        # если pom не найден, просто добавляем пакет в порядок (как "лист")
-        if deps is not None:
-            for dep in deps:
-                dep_name = dep["artifactId"]
-                dep_version = dep["version"]
+            # уже обработан
+            if child in visited:
+                continue
 
-                # фильтр по подстроке
-                if packet_filter and packet_filter in dep_name:
-                    continue
+            temp_mark.add(child)
+            stack.append((child, iter(graph.get(child, ()))))
+            break
+        else:
+            # все дети обработаны - добавляем тек пакет в конец после всех завис
+            stack.pop()
+            temp_mark.remove(node)
+            visited.add(node)
+            order.append(node)
 
-                # рекурсивный обход
-                dfs(dep_name, dep_version if dep_version else None)
+    return order
 
-        temp_mark.remove(state)
-        visited.add(state)
 
-        # добавляем тек пакет в конец после всех завис
-        if version:
-            order.append(f"{name}:{version}")
+# то же для CompactGraph: обход по номерам вершин прямо по массивам ребер
+def _load_order_compact(
+    graph: "CompactGraph",
+    root: str,
+    broken_edges: list[tuple[str, str]] | None
+) -> list[str]:
+    root_id = graph.ids.get(root)
+    if root_id is None:
+        return [root]
+
+    names, targets, edges = graph.names, graph.targets, graph.edge_range
+    mark = bytearray(len(names)) # 0 - не видели, 1 - на текущем пути, 2 - обработан
+    order: list[str] = []
+
+    # для каждой вершины на стеке - позиция следующего ребра и конец ее списка соседей
+    mark[root_id] = 1
+    stack = [(root_id, *edges(root_id))]
+
+    while stack:
+        node_id, pos, end = stack[-1]
+
+        while pos < end:
+            child = targets[pos]
+            pos += 1
+            if mark[child] == 1 and broken_edges is not None:
+                broken_edges.append((names[node_id], names[child]))
+            elif mark[child] == 0:
+                stack[-1] = (node_id, pos, end)
+                mark[child] = 1
+                stack.append((child, *edges(child)))
+                break
         else:
-            order.append(name)
-
-    # старт с корневого пакета
-    dfs(start_name, start_version)
+            stack.pop()
+            mark[node_id] = 2
+            order.append(names[node_id])
 
     return order
 
@@ -206,8 +1774,154 @@ def compute_load_order(
 
 
 
+# компоненты сильной связности (алгоритм Тарьяна без рекурсии), линейное время
+# компоненты идут от стоков к корню, пакеты внутри компоненты - в порядке обхода
+def strongly_connected_components(graph: Mapping[str, list[str]]) -> list[list[str]]:
+    g = CompactGraph.from_mapping(graph)
+    n = g.node_count()
+    targets, edges = g.targets, g.edge_range
+
+    index = array("i", [-1]) * n # порядковый номер захода в вершину
+    low = array("i", [0]) * n # минимальный номер, достижимый из поддерева
+    on_stack = bytearray(n)
+    stack: list[int] = []
+    components: list[list[int]] = []
+    counter = 0
+
+    for start in range(n):
+        if index[start] >= 0:
+            continue
+
+        index[start] = low[start] = counter
+        counter += 1
+        stack.append(start)
+        on_stack[start] = 1
+        work = [(start, *edges(start))] # вершина, следующее ребро, конец ребер
+
+        while work:
+            v, pos, end = work[-1]
+
+            if pos < end:
+                w = targets[pos]
+                work[-1] = (v, pos + 1, end)
+                if index[w] < 0:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = 1
+                    work.append((w, *edges(w)))
+                elif on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[v] < low[parent]:
+                    low[parent] = low[v]
+
+            # v - корень компоненты, снимаем ее со стека
+            if low[v] == index[v]:
+                component = []
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = 0
+                    component.append(w)
+                    if w == v:
+                        break
+                component.sort()
+                components.append(component)
+
+    return [[g.names[i] for i in component] for component in components]
+
+
+# компоненты, которые образуют циклы: больше одного пакета или пакет, зависящий от себя
+def find_cycles(
+    graph: Mapping[str, list[str]],
+    components: list[list[str]] | None = None
+) -> list[list[str]]:
+    if components is None:
+        components = strongly_connected_components(graph)
+    return [
+        c for c in components
+        if len(c) > 1 or c[0] in graph.get(c[0], ())
+    ]
+
+
+# имя вершины сжатого графа для компоненты
+def component_label(component: list[str]) -> str:
+    if len(component) == 1:
+        return component[0]
+    return "{" + ", ".join(component) + "}"
+
+
+# сжатый граф: каждая компонента сильной связности становится одной вершиной
+# результат - ациклический граф и соответствие пакет - вершина сжатого графа
+def condense_graph(
+    graph: Mapping[str, list[str]],
+    components: list[list[str]] | None = None
+) -> tuple["CompactGraph", dict[str, str]]:
+    g = CompactGraph.from_mapping(graph)
+    if components is None:
+        components = strongly_connected_components(g)
+
+    comp_of: dict[str, str] = {} # пакет - имя его компоненты
+    for component in components:
+        label = component_label(component)
+        for node in component:
+            comp_of[node] = label
+
+    # ребра между компонентами без повторов, порядок - как у строк исходного графа
+    adjacency: dict[str, dict[str, None]] = {}
+    for node, neighbors in g.items():
+        src = comp_of[node]
+        targets = adjacency.setdefault(src, {})
+        for n in neighbors:
+            dst = comp_of[n]
+            if dst != src:
+                targets[dst] = None
+
+    dag = CompactGraph()
+    for src in adjacency:
+        dag.intern(src)
+    for src, targets in adjacency.items():
+        dag.add_row(dag.ids[src], [dag.intern(dst) for dst in targets])
+    return dag, comp_of
+
+
+# вывод групп пакетов с циклическими зависимостями
+def print_cycles(cycles: list[list[str]]):
+    print("\nциклические зависимости:")
+    if not cycles:
+        print("циклов не найдено")
+        return
+    for i, cycle in enumerate(cycles, 1):
+        print(f"{i}. {', '.join(cycle)}")
+
+
+WHY_MAX_PATHS = 100 # больше путей --why_all не печатает: на графах с ромбами их число растет экспоненциально
+
+
+# вывод ответа на --why: кратчайший путь (или все кратчайшие) от корня до пакета
+def print_why(graph: DependencyGraph, target: str, all_paths: bool = False):
+    print(f"\nпочему в графе {target}:")
+    if all_paths:
+        paths = list(islice(graph.shortest_paths(target), WHY_MAX_PATHS + 1))
+    else:
+        path = graph.path_to(target)
+        paths = [path] if path is not None else []
+
+    if not paths:
+        print(f"{target} не достижим из {graph.root}")
+    for i, path in enumerate(paths[:WHY_MAX_PATHS], 1):
+        print(f"{i}. {' -> '.join(path)}")
+    if len(paths) > WHY_MAX_PATHS:
+        print(f"показаны первые {WHY_MAX_PATHS} путей")
+    print(f"раскрыто пакетов: {graph.expanded()}")
+
+
 # вывод графа в текстовом виде
-def print_graph_ascii(graph: dict[str, list[str]]):
+def print_graph_ascii(graph: Mapping[str, list[str]]):
     print("\nграф зависимостей:")
     if not graph:
         print("граф пуст")
@@ -221,7 +1935,7 @@ def print_graph_ascii(graph: dict[str, list[str]]):
 
 # NEW
 # формирование текстового представления графа на языке PlantUML
-def graph_to_plantuml(graph: dict[str, list[str]]) -> str: # аргумент ключ зависимости
+def graph_to_plantuml(graph: Mapping[str, list[str]]) -> str: # аргумент ключ зависимости
     lines: list[str] = ["@startuml"]
 
     edges: set[tuple[str, str]] = set() # ребра множестов пар строк
@@ -245,65 +1959,297 @@ def graph_to_plantuml(graph: dict[str, list[str]]) -> str: # аргумент к
     return "\n".join(lines)
 
 
+# узел другой части в файле части: отдельный стереотип, серая заливка и ссылка на файл,
+# где узел описан
+PLANTUML_STUB_STEREOTYPE = "заглушка"
+PLANTUML_STUB_COLOR = "#DDDDDD"
 
 
-from collections import defaultdict # пустой список для несуществ ключей
+# разбиение графа на части для plantuml: узлы идут в порядке обхода в глубину
+# от корня, так что поддерево попадает в одну часть; часть закрывается, когда
+# следующий узел вывел бы ее за max_nodes узлов (свои и заглушки чужих) или
+# за max_edges ребер. Узел с большим числом соседей может один превысить бюджет
+def partition_graph(
+    graph: Mapping[str, list[str]],
+    root: str,
+    max_nodes: int | None = None,
+    max_edges: int | None = None
+) -> list[list[str]]:
+    order: list[str] = []
+    seen: set[str] = set()
 
-# NEW — SVG с раскладкой по уровням (как GraphViz)
-def save_graph_as_svg(graph: dict[str, list[str]], svg_path: str, root: str): # узел - дети, путь к файлу, корень
+    # сначала все достижимое из корня, потом строки, до которых обход не дошел
+    starts = [root] if root in graph else []
+    starts.extend(graph)
 
-    level: dict[str, int] = {root: 0} # узел - номер уровня
-    q: deque[str] = deque([root]) # очередь в шиирну
+    for start in starts:
+        if start in seen:
+            continue
+        seen.add(start)
+        order.append(start)
+        stack = [iter(graph.get(start, ()))]
+
+        while stack:
+            for n in stack[-1]:
+                if n not in seen:
+                    seen.add(n)
+                    order.append(n)
+                    stack.append(iter(graph.get(n, ())))
+                    break
+            else:
+                stack.pop()
+
+    parts: list[list[str]] = []
+    current: list[str] = []
+    present: set[str] = set() # узлы, которые появятся в файле части
+    edges = 0
+
+    for node in order:
+        targets = set(graph.get(node, ()))
+        new_nodes = (node not in present) + len(targets - present)
+
+        over_nodes = max_nodes is not None and len(present) + new_nodes > max_nodes
+        over_edges = max_edges is not None and edges + len(targets) > max_edges
+        if current and (over_nodes or over_edges):
+            parts.append(current)
+            current = []
+            present = set()
+            edges = 0
+
+        current.append(node)
+        present.add(node)
+        present.update(targets)
+        edges += len(targets)
+
+    if current:
+        parts.append(current)
+    return parts
+
+
+# записать части в base.1.puml, base.2.puml ... за один проход по узлам каждой части;
+# ребро пишется в часть источника, чужой узел-приемник помечается заглушкой
+# со ссылкой на свой файл. В base.puml - обзор: части и связи между ними
+def write_plantuml_parts(
+    graph: Mapping[str, list[str]],
+    parts: list[list[str]],
+    base: str
+) -> list[str]:
+    part_of = {node: i for i, nodes in enumerate(parts) for node in nodes}
+    paths = [f"{base}.{i + 1}.puml" for i in range(len(parts))]
+    names = [os.path.basename(path) for path in paths]
+    links: dict[tuple[int, int], None] = {} # связи частей в порядке появления
+
+    for i, nodes in enumerate(parts):
+        with open(paths[i], "w", encoding="utf-8") as f:
+            f.write("@startuml")
+            for node in nodes:
+                f.write(f'\n"{node}"')
+
+            stubs: set[str] = set()
+            for node in nodes:
+                for dst in dict.fromkeys(graph.get(node, ())): # без повторов ребер
+                    j = part_of[dst]
+                    if j != i:
+                        links[(i, j)] = None
+                        if dst not in stubs: # объявление заглушки идет до первого ребра к ней
+                            stubs.add(dst)
+                            f.write(
+                                f'\nparticipant "{dst}" <<{PLANTUML_STUB_STEREOTYPE}>> '
+                                f"[[{names[j]}]] {PLANTUML_STUB_COLOR}"
+                            )
+                    f.write(f'\n"{node}" -> "{dst}"')
+
+            f.write("\n@enduml\n")
+
+    with open(base + ".puml", "w", encoding="utf-8") as f:
+        f.write("@startuml")
+        for name in names:
+            f.write(f'\n"{name}"')
+        for i, j in links:
+            f.write(f'\n"{names[i]}" -> "{names[j]}"')
+        f.write("\n@enduml\n")
+
+    return paths
 
-    while q:
-        node = q.popleft()
-        for n in graph.get(node, []): # дети тек
-            if n not in level:
-                level[n] = level[node] + 1
-                q.append(n)
-
-    levels: dict[int, list[str]] = defaultdict(list) # номер - список узлов
-    for node, lvl in level.items():
-        levels[lvl].append(node)
-
-    node_width = 220 # ширина блока
-    node_height = 40 # высота
-    margin = 40 # отступ
-    horiz_gap = 40  # расстояние между узлами по горизонтали
-    vert_gap = 80    # расстояние между уровнями по вертикали
-
-    max_nodes_in_level = max(len(nodes) for nodes in levels.values()) # макс колво узлов на одном уровне
-    svg_width = max_nodes_in_level * node_width + (max_nodes_in_level - 1) * horiz_gap + margin * 2 # общ ширина
-    num_levels = len(levels)
-    svg_height = num_levels * node_height + (num_levels - 1) * vert_gap + margin * 2 # сумм высота
-
-    svg_lines: list[str] = [
-        '<?xml version="1.0" encoding="UTF-8" standalone="no"?>',
-        f'<svg xmlns="http://www.w3.org/2000/svg" width="{svg_width}" height="{svg_height}">'
-    ]
 
-    # для узла: левый верхний угол по x y и центр для стрелок
-    positions: dict[str, tuple[float, float, float]] = {}  # node -> (x, y, x_center)
 
-    for lvl in sorted(levels.keys()):
-        nodes_on_level = levels[lvl] # узлов на уровне
-        n = len(nodes_on_level)
 
-        # ширина для всех на уровне
-        row_width = n * node_width + (n - 1) * horiz_gap
-        
-        start_x = (svg_width - row_width) / 2
+from collections import defaultdict # пустой список для несуществ ключей
 
-        y = margin + lvl * (node_height + vert_gap)
+# размеры раскладки svg
+SVG_NODE_WIDTH = 220 # ширина блока
+SVG_NODE_HEIGHT = 40 # высота
+SVG_MARGIN = 40 # отступ
+SVG_HORIZ_GAP = 40  # расстояние между узлами по горизонтали
+SVG_VERT_GAP = 80    # расстояние между уровнями по вертикали
+
+SVG_MAX_ROW_NODES = 25 # узлы широкого уровня переносятся на следующую строку
+SVG_LAYOUT_SWEEPS = 4 # проходов упорядочивания уровней вниз и вверх
+SVG_ROUTE_MAX_ROWS = 8 # ребра через большее число строк идут по левому полю
+
+SVG_WRITE_BUFFER = 1 << 16 # буфер записи svg, байт
+
+# общие определения компактного svg: те же цвета и размеры, что у style в полном виде
+# стрелка-маркер не поворачивается (orient="0") и совпадает с треугольником полного вида:
+# основание 10 на 5 выше конца линии, острие в конце линии
+SVG_COMPACT_DEFS = (
+    "\n<defs>"
+    "\n<style>"
+    ".n{fill:#9C8B72;stroke:#5B7187;stroke-width:2}"
+    ".t{font-size:14px;font-family:monospace}"
+    ".e{fill:none;stroke:#5B7187;stroke-width:2}"
+    "</style>"
+    f'\n<rect id="node" class="n" width="{SVG_NODE_WIDTH}" height="{SVG_NODE_HEIGHT}"/>'
+    '\n<marker id="arrow" markerUnits="userSpaceOnUse" markerWidth="10" markerHeight="5" '
+    'viewBox="-5 -5 10 5" refX="0" refY="0" orient="0">'
+    '<path d="M-5,-5H5L0,0Z" fill="#5B7187"/></marker>'
+    "\n</defs>"
+)
+
+
+# открыть svg для записи: файл .svgz сжимается gzip
+def _open_svg(svg_path: str):
+    if svg_path.endswith(".svgz"):
+        return gzip.open(svg_path, "wt", encoding="utf-8")
+    return open(svg_path, "w", encoding="utf-8", buffering=SVG_WRITE_BUFFER)
 
-        for i, node in enumerate(nodes_on_level):
-            x = start_x + i * (node_width + horiz_gap)
 
-            # прямоугольник
-            svg_lines.append(
-                f'<rect x="{x}" y="{y}" width="{node_width}" height="{node_height}" '
-                f'style="fill:#9C8B72;stroke:#5B7187;stroke-width:2"/>'
+# NEW — SVG с раскладкой по уровням (как GraphViz)
+# элементы пишутся в файл по мере раскладки, документ целиком в памяти не собирается
+# compact - блоки через <use>, оформление css-классами, одна стрелка-<marker> на все ребра;
+# картинка та же, а файл в несколько раз меньше и быстрее разбирается браузером
+def save_graph_as_svg(
+    graph: Mapping[str, list[str]],
+    svg_path: str,
+    root: str,
+    compact: bool = False
+): # узел - дети, путь к файлу, корень
+
+    rows = layered_layout(graph, root) # строки узлов сверху вниз
+
+    max_nodes_in_row = max(len(nodes) for nodes in rows) # макс колво узлов в одной строке
+    svg_width = max_nodes_in_row * SVG_NODE_WIDTH + (max_nodes_in_row - 1) * SVG_HORIZ_GAP + SVG_MARGIN * 2 # общ ширина
+    num_rows = len(rows)
+    svg_height = num_rows * SVG_NODE_HEIGHT + (num_rows - 1) * SVG_VERT_GAP + SVG_MARGIN * 2 # сумм высота
+
+    with _open_svg(svg_path) as f:
+        # каждая следующая строка начинается с перевода строки - как при "\n".join
+        f.write('<?xml version="1.0" encoding="UTF-8" standalone="no"?>')
+        if compact:
+            f.write(
+                f'\n<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+                f'width="{svg_width}" height="{svg_height}">'
             )
+            f.write(SVG_COMPACT_DEFS)
+        else:
+            f.write(f'\n<svg xmlns="http://www.w3.org/2000/svg" width="{svg_width}" height="{svg_height}">')
+        _write_svg_body(f, graph, rows, svg_width, compact)
+        f.write("\n</svg>")
+
+
+# послойная раскладка графа для рисования
+# 1) уровни - расстояние от корня (обход в ширину)
+# 2) порядок внутри уровня - метод барицентров: несколько проходов вниз и вверх,
+#    узел ставится по среднему положению своих соседей на соседнем уровне, это уменьшает пересечения
+# 3) слишком широкие уровни переносятся на несколько строк по SVG_MAX_ROW_NODES узлов
+# каждый проход - сортировка уровней, поэтому все вместе почти линейно по размеру графа
+def layered_layout(
+    graph: Mapping[str, list[str]],
+    root: str,
+    max_row: int = SVG_MAX_ROW_NODES,
+    sweeps: int = SVG_LAYOUT_SWEEPS
+) -> list[list[str]]:
+    g = CompactGraph.from_mapping(graph)
+    root_id = g.ids.get(root)
+    if root_id is None:
+        return [[root]]
+
+    n = g.node_count()
+    targets, edges = g.targets, g.edge_range
+
+    level = array("i", [-1]) * n # узел - номер уровня
+    level[root_id] = 0
+    levels: list[list[int]] = [[root_id]] # номер - список узлов
+    q: deque[int] = deque([root_id]) # очередь в шиирну
+
+    # ребра между соседними уровнями: вниз (дети) и вверх (родители)
+    down: dict[int, list[int]] = defaultdict(list)
+    up: dict[int, list[int]] = defaultdict(list)
+
+    while q:
+        node = q.popleft()
+        start, end = edges(node)
+        for i in range(start, end): # дети тек
+            child = targets[i]
+            if level[child] < 0:
+                level[child] = level[node] + 1
+                if level[child] == len(levels):
+                    levels.append([])
+                levels[level[child]].append(child)
+                q.append(child)
+            if level[child] == level[node] + 1:
+                down[node].append(child)
+                up[child].append(node)
+
+    pos = array("d", [0.0]) * n # место узла внутри своего уровня
+    for nodes in levels:
+        for i, node in enumerate(nodes):
+            pos[node] = i
+
+    for _ in range(sweeps):
+        for lvl in range(1, len(levels)):
+            _barycenter_sort(levels[lvl], up, pos)
+        for lvl in range(len(levels) - 2, -1, -1):
+            _barycenter_sort(levels[lvl], down, pos)
+
+    # перенос широких уровней
+    rows: list[list[str]] = []
+    for nodes in levels:
+        for i in range(0, len(nodes), max_row):
+            rows.append([g.names[node] for node in nodes[i:i + max_row]])
+    return rows
+
+
+# упорядочить уровень по среднему месту соседей, узлы без соседей остаются на своем месте
+def _barycenter_sort(nodes: list[int], neighbors: dict[int, list[int]], pos: array):
+    keys = {}
+    for node in nodes:
+        around = neighbors.get(node)
+        keys[node] = sum(pos[u] for u in around) / len(around) if around else pos[node]
+    nodes.sort(key=keys.__getitem__) # сортировка устойчивая - при равенстве порядок не меняется
+    for i, node in enumerate(nodes):
+        pos[node] = i
+
+
+# узлы по строкам и стрелки между ними
+def _write_svg_body(
+    f,
+    graph: Mapping[str, list[str]],
+    rows: list[list[str]],
+    svg_width: int,
+    compact: bool = False
+):
+    # для узла: левый верхний угол по x y, центр для стрелок и номер строки
+    positions: dict[str, tuple[float, float, float, int]] = {}  # node -> (x, y, x_center, row)
+    row_starts: list[float] = [] # x первого узла каждой строки
+
+    # в компактном виде шрифт задается один раз на всю группу узлов
+    if compact:
+        f.write('\n<g class="t">')
+
+    for row, nodes_on_row in enumerate(rows):
+        n = len(nodes_on_row) # узлов в строке
+
+        # ширина для всех в строке
+        row_width = n * SVG_NODE_WIDTH + (n - 1) * SVG_HORIZ_GAP
+
+        start_x = (svg_width - row_width) / 2
+        row_starts.append(start_x)
+
+        y = SVG_MARGIN + row * (SVG_NODE_HEIGHT + SVG_VERT_GAP)
+
+        for i, node in enumerate(nodes_on_row):
+            x = start_x + i * (SVG_NODE_WIDTH + SVG_HORIZ_GAP)
 
             # текст
             text = (
@@ -311,78 +2257,274 @@ def save_graph_as_svg(graph: dict[str, list[str]], svg_path: str, root: str): #
                     .replace("<", "&lt;")
                     .replace(">", "&gt;")
             )
-            svg_lines.append(
-                f'<text x="{x + 10}" y="{y + 25}" font-size="14" '
+
+            if compact:
+                f.write(
+                    f'\n<use xlink:href="#node" x="{_svg_num(x)}" y="{y}"/>'
+                    f'<text x="{_svg_num(x + 10)}" y="{y + 25}">{text}</text>'
+                )
+                x_center = x + SVG_NODE_WIDTH / 2
+                positions[node] = (x, y, x_center, row)
+                continue
+
+            # прямоугольник
+            f.write(
+                f'\n<rect x="{x}" y="{y}" width="{SVG_NODE_WIDTH}" height="{SVG_NODE_HEIGHT}" '
+                f'style="fill:#9C8B72;stroke:#5B7187;stroke-width:2"/>'
+            )
+
+            f.write(
+                f'\n<text x="{x + 10}" y="{y + 25}" font-size="14" '
                 f'style="font-family: monospace">{text}</text>'
             )
 
-            x_center = x + node_width / 2
-            positions[node] = (x, y, x_center)
+            x_center = x + SVG_NODE_WIDTH / 2
+            positions[node] = (x, y, x_center, row)
+
+    row_sizes = [len(nodes) for nodes in rows]
+
+    # в компактном виде оформление и маркер стрелки наследуются от группы,
+    # а ребра пишутся короткими path без атрибутов стиля
+    if compact:
+        f.write('\n</g>\n<g class="e" marker-end="url(#arrow)">')
+        _write_svg_edges_compact(f, graph, positions, row_starts, row_sizes)
+        f.write('\n</g>')
+        return
 
     # стрелкт
     for src, neighbors in graph.items():
         if src not in positions:
             continue
-        _, y_src, x_center_src = positions[src]
-        y_src_bottom = y_src + node_height
+        _, y_src, x_center_src, row_src = positions[src]
+        y_src_bottom = y_src + SVG_NODE_HEIGHT
 
         for dst in neighbors:
             if dst not in positions:
                 continue
-            _, y_dst, x_center_dst = positions[dst]
+            _, y_dst, x_center_dst, row_dst = positions[dst]
             y_dst_top = y_dst
 
-            # линия от нижней границы src к верхней dst
-            svg_lines.append(
-                f'<line x1="{x_center_src}" y1="{y_src_bottom}" '
-                f'x2="{x_center_dst}" y2="{y_dst_top}" '
-                f'style="stroke:#5B7187;stroke-width:2"/>'
-            )
+            if row_dst == row_src + 1:
+                # линия от нижней границы src к верхней dst
+                f.write(
+                    f'\n<line x1="{x_center_src}" y1="{y_src_bottom}" '
+                    f'x2="{x_center_dst}" y2="{y_dst_top}" '
+                    f'style="stroke:#5B7187;stroke-width:2"/>'
+                )
+            else:
+                # ребро через несколько строк или вверх - ломаная в промежутках между узлами
+                points = _route_edge(
+                    x_center_src, row_src, x_center_dst, row_dst, row_starts, row_sizes
+                )
+                f.write(
+                    f'\n<polyline points="{" ".join(f"{x},{y}" for x, y in points)}" '
+                    f'style="fill:none;stroke:#5B7187;stroke-width:2"/>'
+                )
 
             # маленький треугольник-стрелка возле dst
             arrow_y = y_dst_top
             arrow_size = 5
-            svg_lines.append(
-                f'<polygon points="'
+            f.write(
+                f'\n<polygon points="'
                 f'{x_center_dst - arrow_size},{arrow_y - arrow_size} '
                 f'{x_center_dst + arrow_size},{arrow_y - arrow_size} '
                 f'{x_center_dst},{arrow_y}'
                 f'" style="fill:#5B7187"/>'
             )
 
-    svg_lines.append("</svg>")
 
-    with open(svg_path, "w", encoding="utf-8") as f:
-        f.write("\n".join(svg_lines))
+def _write_svg_edges_compact(
+    f,
+    graph: Mapping[str, list[str]],
+    positions: dict[str, tuple[float, float, float, int]],
+    row_starts: list[float],
+    row_sizes: list[int]
+):
+    for src, neighbors in graph.items():
+        if src not in positions:
+            continue
+        _, y_src, x_center_src, row_src = positions[src]
+
+        for dst in neighbors:
+            if dst not in positions:
+                continue
+            _, y_dst, x_center_dst, row_dst = positions[dst]
+
+            if row_dst == row_src + 1:
+                points = [(x_center_src, y_src + SVG_NODE_HEIGHT), (x_center_dst, y_dst)]
+            else:
+                points = _route_edge(
+                    x_center_src, row_src, x_center_dst, row_dst, row_starts, row_sizes
+                )
+
+            # M x y L x y x y ... - повторные пары после L тоже lineto
+            coords = " ".join(f"{_svg_num(x)} {_svg_num(y)}" for x, y in points[1:])
+            x0, y0 = points[0]
+            f.write(f'\n<path d="M{_svg_num(x0)} {_svg_num(y0)}L{coords}"/>')
+
+
+# координата без лишнего ".0": 150.0 -> "150", 150.5 -> "150.5"
+def _svg_num(v: float) -> str:
+    i = int(v)
+    return str(i) if i == v else repr(v)
+
+
+# y верхней границы узлов строки
+def _row_top(row: int) -> float:
+    return SVG_MARGIN + row * (SVG_NODE_HEIGHT + SVG_VERT_GAP)
+
+
+# промежуток между узлами строки, ближайший к x
+def _row_gap_x(x: float, start_x: float, n: int) -> float:
+    pitch = SVG_NODE_WIDTH + SVG_HORIZ_GAP
+    first_gap = start_x - SVG_HORIZ_GAP / 2 # промежуток слева от первого узла
+    j = min(max(round((x - first_gap) / pitch), 0), n)
+    return first_gap + j * pitch
+
+
+# точки ломаной для ребра, которое не идет в соседнюю строку ниже
+# ребро проходит строки между src и dst через промежутки между узлами,
+# а если строк больше SVG_ROUTE_MAX_ROWS - по левому полю, чтобы число точек не зависело от высоты
+# стрелка всегда входит в dst сверху, поэтому ребра вверх заходят в dst из промежутка над его строкой
+def _route_edge(
+    x_src: float,
+    row_src: int,
+    x_dst: float,
+    row_dst: int,
+    row_starts: list[float],
+    row_sizes: list[int]
+) -> list[tuple[float, float]]:
+    offset = SVG_VERT_GAP / 4 # отступ ломаной от строки узлов, помещается и в поле над первой строкой
+    going_down = row_dst > row_src
+
+    if going_down:
+        points = [(x_src, _row_top(row_src) + SVG_NODE_HEIGHT)]
+        between = range(row_src + 1, row_dst)
+    else:
+        points = [(x_src, _row_top(row_src))]
+        between = range(row_src - 1, row_dst - 1, -1) # включая строку dst: входим в него сверху
+    y_dst_top = _row_top(row_dst)
+
+    if len(between) > SVG_ROUTE_MAX_ROWS:
+        x_bus = SVG_MARGIN / 2
+        y_exit = points[0][1] + (offset if going_down else -offset)
+        points += [(x_bus, y_exit), (x_bus, y_dst_top - offset)]
+    elif not between:
+        # та же строка: дуга через промежуток над ней
+        points.append(((x_src + x_dst) / 2, y_dst_top - offset))
+    else:
+        steps = len(between) + 1
+        for i, row in enumerate(between, 1):
+            x = _row_gap_x(x_src + (x_dst - x_src) * i / steps, row_starts[row], row_sizes[row])
+            top = _row_top(row)
+            bottom = top + SVG_NODE_HEIGHT
+            if going_down:
+                points += [(x, top - offset), (x, bottom + offset)]
+            else:
+                points += [(x, bottom + offset), (x, top - offset)]
+
+    points.append((x_dst, y_dst_top))
+    return points
+
 
 
 
 # NEW
 # вывод графа в виде аски 
-def print_ascii_tree(graph: dict[str, list[str]], root: str): # пакет:версия корень
-    visited: set[str] = set() # уже запис
-
-    def _print(node: str, prefix: str, is_last: bool):
-        # строка для текущего узла
-        if prefix == "":
-            line = node
+ASCII_TREE_BATCH = 4096 # строк дерева на одну запись в поток
+
+
+# число строк под узлом при первом (полном) раскрытии: тот же обход в глубину,
+# что и при выводе, но без ограничения глубины. Нужен заранее, чтобы у повтора
+# сразу печатать размер свернутого поддерева, в том числе у повтора предка в цикле
+def _ascii_subtree_sizes(graph: Mapping[str, list[str]], root: str) -> dict[str, int]:
+    sizes: dict[str, int] = {}
+    expanded = {root}
+    stack = [[root, iter(graph.get(root, ())), 0]] # узел, дети, строк под ним
+
+    while stack:
+        frame = stack[-1]
+        for child in frame[1]:
+            frame[2] += 1
+            if child not in expanded and graph.get(child):
+                expanded.add(child)
+                stack.append([child, iter(graph.get(child, ())), 0])
+                break
         else:
-            connector = "└─ " if is_last else "├─ " # последний нет ребенок
-            line = prefix + connector + node
-        print(line)
-
-        if node in visited:
-            return
-        visited.add(node)
-
-        children = graph.get(node, []) # дети тек
-        for i, child in enumerate(children):
-            last_child = (i == len(children) - 1)
-            child_prefix = prefix + ("   " if is_last else "│  ")
-            _print(child, child_prefix, last_child)
-
-    print("\nзависимости в виде ASCII-дерева:")
-    _print(root, "", True)
+            stack.pop()
+            sizes[frame[0]] = frame[2]
+            if stack:
+                stack[-1][2] += frame[2]
+
+    return sizes
+
+
+# строки ascii-дерева без рекурсии. Узел с детьми раскрывается один раз, повтор
+# печатается свернутым с размером поддерева; глубже max_depth дети не показываются
+def ascii_tree_lines(
+    graph: Mapping[str, list[str]],
+    root: str,
+    max_depth: int | None = None
+) -> Iterator[str]:
+    sizes = _ascii_subtree_sizes(graph, root)
+    expanded: set[str] = set()
+
+    # текст узла и его дети, если узел раскрывается здесь
+    def describe(node: str, depth: int) -> tuple[str, list[str] | None]:
+        children = graph.get(node)
+        if not children:
+            return node, None
+        if node in expanded:
+            return f"{node} (повтор, строк под ним: {sizes[node]})", None
+        if max_depth is not None and depth >= max_depth:
+            return f"{node} (глубже не показано, строк: {sizes[node]})", None
+        expanded.add(node)
+        return node, children
+
+    text, children = describe(root, 0)
+    yield text
+
+    # дети, следующий по порядку, префикс детей, их глубина
+    stack: list[list] = []
+    if children:
+        stack.append([children, 0, "   ", 1])
+
+    while stack:
+        frame = stack[-1]
+        children, i, prefix, depth = frame
+        if i == len(children):
+            stack.pop()
+            continue
+        frame[1] = i + 1
+
+        is_last = i == len(children) - 1 # последний ребенок
+        text, grandchildren = describe(children[i], depth)
+        yield prefix + ("└─ " if is_last else "├─ ") + text
+
+        if grandchildren:
+            stack.append([grandchildren, 0, prefix + ("   " if is_last else "│  "), depth + 1])
+
+
+def print_ascii_tree(
+    graph: Mapping[str, list[str]],
+    root: str, # пакет:версия корень
+    max_depth: int | None = None,
+    out=None
+):
+    out = sys.stdout if out is None else out
+    out.write("\nзависимости в виде ASCII-дерева:\n")
+
+    # строки пишутся пачками, а не print на каждую
+    batch: list[str] = []
+    for line in ascii_tree_lines(graph, root, max_depth):
+        batch.append(line)
+        if len(batch) >= ASCII_TREE_BATCH:
+            batch.append("")
+            out.write("\n".join(batch))
+            batch.clear()
+    if batch:
+        batch.append("")
+        out.write("\n".join(batch))
 
 
 def main():
@@ -417,11 +2559,19 @@ def main():
         help="Версия пакета."
     )
 
+    parser.add_argument(
+        '-g',
+        '--packet_group',
+        type=str,
+        default="",
+        help="groupId пакета (нужен для удаленного репозитория)."
+    )
+
     parser.add_argument(
         '-o', 
         '--output_file',    
         type=str, 
-        help="Имя сгенерированного файла с изображением графа."
+        help="Имя сгенерированного файла с изображением графа (.svgz - сжатый gzip)."
     )
 
     parser.add_argument(
@@ -438,6 +2588,12 @@ def main():
         help="Подстрока для фильтрации пакетов."
     )
 
+    parser.add_argument(
+        "--filter_file",
+        type=str,
+        help="Файл шаблонов фильтра: groupId:artifactId, artifactId, glob, re:выражение; '+' в начале - разрешить."
+    )
+
     parser.add_argument(
         "--show_direct_deps",
         action="store_true", # есои пользователь указал
@@ -457,6 +2613,161 @@ def main():
         help="Показать порядок загрузки зависимостей для пакета."
     )
 
+    parser.add_argument(
+        "--cycles",
+        action="store_true",
+        help="Найти циклические зависимости (компоненты сильной связности)."
+    )
+
+    parser.add_argument(
+        "--condense",
+        action="store_true",
+        help="Сжать циклы в одну вершину: граф, рисунки и порядок загрузки строятся по сжатому графу."
+    )
+
+    parser.add_argument(
+        "--why",
+        type=str,
+        help="Кратчайший путь от корня до пакета 'имя' или 'имя:версия' (обход останавливается на нем)."
+    )
+
+    parser.add_argument(
+        "--why_all",
+        action="store_true",
+        help="Для --why вывести все кратчайшие пути, а не один."
+    )
+
+    parser.add_argument(
+        "--scopes",
+        type=str,
+        help="Действующие области видимости зависимостей через запятую, например compile,runtime (по умолчанию - все): транзитивная зависимость test-пакета считается test, как в maven."
+    )
+
+    parser.add_argument(
+        "--mediate",
+        action="store_true",
+        help="Выбирать одну версию пакета, как maven: ближайшую к корню; остальные версии не обходятся."
+    )
+
+    parser.add_argument(
+        "--svg_compact",
+        action="store_true",
+        help="Компактный svg: стили в css-классах, общий маркер стрелки и <use> для блоков."
+    )
+
+    parser.add_argument(
+        "--max_depth",
+        type=int,
+        help="Глубина ASCII-дерева: более глубокие узлы свернуты с указанием размера."
+    )
+
+    parser.add_argument(
+        "--puml_max_nodes",
+        type=int,
+        help="Делить .puml на части не больше чем по столько узлов (со ссылками-заглушками между частями)."
+    )
+
+    parser.add_argument(
+        "--puml_max_edges",
+        type=int,
+        help="Делить .puml на части не больше чем по столько ребер."
+    )
+
+    parser.add_argument(
+        "--state",
+        type=str,
+        help="Файл состояния прошлой сборки: заново разбираются только изменившиеся pom.xml."
+    )
+
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Следить за pom.xml и перерисовывать .puml/.svg при изменениях (нужны --build_graph и --output_file)."
+    )
+
+    parser.add_argument(
+        "--watch_interval",
+        type=float,
+        default=1.0,
+        help="Период проверки pom.xml в режиме --watch, секунды."
+    )
+
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Число параллельных загрузок pom.xml на каждом уровне обхода."
+    )
+
+    parser.add_argument(
+        "--jobs_mode",
+        type=str,
+        default="thread",
+        help="Чем распараллеливать загрузку: 'thread' или 'process' (для холодного разбора больших pom)."
+    )
+
+    parser.add_argument(
+        "--http_connections",
+        type=int,
+        default=8,
+        help="Размер пула keep-alive соединений к удаленному репозиторию."
+    )
+
+    parser.add_argument(
+        "--index",
+        type=str,
+        help="Файл индекса локального репозитория: граф строится по нему без разбора pom.xml."
+    )
+
+    parser.add_argument(
+        "--build_index",
+        action="store_true",
+        help="Построить или обновить индекс --index по репозиторию --url_link_repo."
+    )
+
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        help="Пакетный режим: файл со списком корней ('имя версия [groupId]' в строке или JSONL)."
+    )
+
+    parser.add_argument(
+        "--batch_output",
+        type=str,
+        help="Папка для вывода пакетного режима: <имя>-<версия>.txt и рисунки для каждого корня."
+    )
+
+    parser.add_argument(
+        "--batch_processes",
+        type=int,
+        default=1,
+        help="Число процессов, по которым распределяются корни манифеста."
+    )
+
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Статистика запуска: прочитанные pom, байты, время этапов, пик памяти (tracemalloc замедляет работу), размер графа."
+    )
+
+    parser.add_argument(
+        "--stats_json",
+        type=str,
+        help="Записать статистику запуска в JSON-файл ('-' - в стандартный вывод); включает --stats."
+    )
+
+    parser.add_argument(
+        "--pom_cache",
+        type=str,
+        help="Файл постоянного кэша разобранных pom.xml (ускоряет повторные запуски)."
+    )
+
+    parser.add_argument(
+        "--pom_cache_size",
+        type=int,
+        default=100000,
+        help="Максимальное число записей в кэше pom.xml."
+    )
 
 
 
@@ -466,8 +2777,17 @@ def main():
 
 
     # проверка 
+    # только построение индекса - пакет не нужен
+    needs_packet = (
+        args.show_direct_deps or args.build_graph or args.load_order or args.why is not None
+        or not args.build_index
+    )
+    # в пакетном режиме корни берутся из манифеста
+    if args.manifest is not None:
+        needs_packet = False
+
     # если имя не указано или там пустая строка
-    if args.packet_name is None or not args.packet_name.strip():
+    if needs_packet and (args.packet_name is None or not args.packet_name.strip()):
         errors.append("укажите --packet_name")
 
     # если адрес указан и не сущесвтут 
@@ -479,8 +2799,79 @@ def main():
         errors.append("--repo_work_mode должен быть 'test' или 'prod'")
 
 
+    # удаленный репозиторий: только http(s) и только в режиме prod
+    if args.url_link_repo is not None and urlparse(args.url_link_repo).netloc:
+        if not is_remote_repo(args.url_link_repo):
+            errors.append("--url_link_repo поддерживает только http и https")
+        elif args.repo_work_mode == "test":
+            errors.append("в режиме test --url_link_repo должен быть локальным путем")
+        elif not args.packet_group.strip() and args.manifest is None:
+            errors.append("для удаленного репозитория укажите --packet_group")
+
+    # индекс строится только по локальному тестовому репозиторию
+    if args.build_index and args.index is None:
+        errors.append("для --build_index укажите файл --index")
+    if args.index is not None:
+        if args.url_link_repo is None or is_remote_repo(args.url_link_repo):
+            errors.append("--index работает только с локальным --url_link_repo")
+        d = os.path.dirname(args.index)
+        if d and not os.path.isdir(d):
+            errors.append("папка для --index не существует")
+
+    # инкрементальная сборка опирается на отпечатки локальных файлов
+    if args.state is not None or args.watch:
+        if args.url_link_repo is None or is_remote_repo(args.url_link_repo):
+            errors.append("--state и --watch работают только с локальным --url_link_repo")
+    if args.state is not None:
+        d = os.path.dirname(args.state)
+        if d and not os.path.isdir(d):
+            errors.append("папка для --state не существует")
+    if args.watch and not (args.build_graph and args.output_file):
+        errors.append("для --watch нужны --build_graph и --output_file")
+    if args.watch_interval <= 0:
+        errors.append("--watch_interval должен быть положительным")
+
+    if args.manifest is not None:
+        if not os.path.isfile(args.manifest):
+            errors.append("файл --manifest не найден")
+        if args.url_link_repo is None:
+            errors.append("для --manifest требуется параметр --url_link_repo")
+        if args.batch_output is None or not os.path.isdir(args.batch_output):
+            errors.append("для --manifest укажите существующую папку --batch_output")
+        if args.state is not None or args.watch:
+            errors.append("--state и --watch не работают в пакетном режиме")
+    if args.batch_processes < 1:
+        errors.append("--batch_processes должен быть положительным")
+
+    # --scopes превращается в множество областей видимости
+    if args.scopes is not None:
+        scopes = frozenset(scope.strip() for scope in args.scopes.split(",") if scope.strip())
+        unknown = sorted(scopes - set(SUPPORTED_SCOPES))
+        if not scopes or unknown:
+            errors.append(f"--scopes допускает только {', '.join(SUPPORTED_SCOPES)}")
+        args.scopes = scopes
+
+    if args.why is not None and not args.why.strip():
+        errors.append("--why не должен быть пустой строкой")
+    if args.why_all and args.why is None:
+        errors.append("--why_all работает только вместе с --why")
+    # ленивый обход не выбирает версии: путь без --mediate может вести через проигравшую версию
+    if args.why is not None and args.mediate:
+        errors.append("--why не работает вместе с --mediate")
+
+    if args.max_depth is not None and args.max_depth < 0:
+        errors.append("--max_depth не может быть отрицательным")
+
+    if args.puml_max_nodes is not None and args.puml_max_nodes < 2:
+        errors.append("--puml_max_nodes должен быть не меньше 2")
+    if args.puml_max_edges is not None and args.puml_max_edges < 1:
+        errors.append("--puml_max_edges должен быть положительным")
+
+    if args.http_connections < 1:
+        errors.append("--http_connections должен быть положительным")
+
     # версия пакета не указана или там пусто
-    if args.packet_version is None or not args.packet_version.strip():
+    if needs_packet and (args.packet_version is None or not args.packet_version.strip()):
         errors.append("--packet_version не должна быть пустой")
 
     # путь к вых файлц существует
@@ -497,6 +2888,35 @@ def main():
     if args.packet_filter is not None and not args.packet_filter.strip():
         errors.append("--packet_filter не должен быть пустой строкой")
 
+    # шаблоны компилируются один раз, дальше вместо подстроки работает общий фильтр
+    if args.filter_file is not None:
+        try:
+            args.packet_filter = PackageFilter.from_file(args.filter_file, args.packet_filter)
+        except OSError as e:
+            errors.append(f"не удалось прочитать --filter_file: {e}")
+        except re.error as e:
+            errors.append(f"ошибка в регулярном выражении --filter_file: {e}")
+
+
+    if args.jobs < 1:
+        errors.append("--jobs должен быть положительным")
+
+    if args.jobs_mode not in SUPPORTED_JOBS_MODES:
+        errors.append("--jobs_mode должен быть 'thread' или 'process'")
+
+    # кэш должен вмещать хотя бы одну запись
+    if args.pom_cache_size < 1:
+        errors.append("--pom_cache_size должен быть положительным")
+
+    if args.stats_json is not None and args.stats_json != "-":
+        d = os.path.dirname(args.stats_json)
+        if d and not os.path.isdir(d):
+            errors.append("папка для --stats_json не существует")
+
+    if args.pom_cache is not None:
+        d = os.path.dirname(args.pom_cache)
+        if d and not os.path.isdir(d):
+            errors.append("папка для --pom_cache не существует")
 
     if errors:
         print("проблемы с параметрами:")
@@ -504,74 +2924,488 @@ def main():
             print(f"{k}")
         sys.exit(2)
 
+    global pom_cache, run_stats
+    if args.stats or args.stats_json is not None:
+        run_stats = RunStats()
+        tracemalloc.start()
+
+    if args.pom_cache:
+        try:
+            pom_cache = PomCache(args.pom_cache, args.pom_cache_size)
+        except sqlite3.Error as e:
+            print(f"кэш pom недоступен: {e}")
+
+    try:
+        run_commands(args)
+    finally:
+        if pom_cache is not None:
+            try:
+                pom_cache.close()
+            except sqlite3.Error as e:
+                print(f"ошибка записи кэша pom: {e}")
+            print(f"\nкэш pom: попаданий {pom_cache.hits}, промахов {pom_cache.misses}")
+            pom_cache = None
+
+        if run_stats is not None:
+            # в пакетном режиме с процессами здесь уже наибольший пик обработчиков
+            run_stats.peak_memory = max(run_stats.peak_memory, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            report_stats(run_stats, args.stats, args.stats_json)
+            run_stats = None
+
+
+# отчет --stats: текстом и/или в json
+def report_stats(stats: RunStats, text: bool, json_path: str | None):
+    if text:
+        print("\nстатистика запуска:")
+        print(f"pom разобрано: {stats.poms_read}, не найдено: {stats.poms_missing}")
+        print(f"прочитано байт: {stats.bytes_read}")
+        for name, seconds in stats.phases.items():
+            print(f"этап {name}: {seconds:.3f} с")
+        print(f"граф: вершин {stats.nodes}, ребер {stats.edges}")
+        print(f"пик памяти (tracemalloc): {stats.peak_memory / 2**20:.1f} МБ")
+
+    if json_path is None:
+        return
+    data = json.dumps(stats.to_dict(), ensure_ascii=False, indent=2)
+    if json_path == "-":
+        print(data)
+        return
+    try:
+        with open(json_path, "w", encoding="utf-8") as f:
+            f.write(data + "\n")
+    except OSError as e:
+        print(f"ошибка записи статистики: {e}")
+
+
+# граф для вывода: исходный или сжатый по компонентам сильной связности
+def _graph_view(
+    graph: Mapping[str, list[str]],
+    root_key: str,
+    condense: bool,
+    components: list[list[str]] | None = None
+) -> tuple[Mapping[str, list[str]], str]:
+    if not condense:
+        return graph, root_key
+    dag, comp_of = condense_graph(graph, components)
+    return dag, comp_of.get(root_key, root_key)
+
+
+# запись .puml рядом с .svg и самого .svg
+def write_graph_files(
+    graph: Mapping[str, list[str]],
+    output_file: str,
+    root_key: str,
+    compact: bool = False,
+    puml_max_nodes: int | None = None,
+    puml_max_edges: int | None = None
+):
+    base, _ = os.path.splitext(output_file)
+    puml_path = base + ".puml"
+
+    try:
+        parts = None
+        if puml_max_nodes is not None or puml_max_edges is not None:
+            parts = partition_graph(graph, root_key, puml_max_nodes, puml_max_edges)
+
+        with _stats_phase("plantuml"):
+            if parts is not None and len(parts) > 1:
+                write_plantuml_parts(graph, parts, base)
+            else:
+                with open(puml_path, "w", encoding="utf-8") as f:
+                    f.write(graph_to_plantuml(graph))
+    except OSError as e:
+        print(f"ошибка записи PlantUML-файла: {e}")
+
+    # свг
+    try:
+        with _stats_phase("svg"):
+            save_graph_as_svg(graph, output_file, root_key, compact)
+    except OSError as e:
+        print(f"ошибка записи SVG-файла: {e}")
+
+
+def _save_state(args: argparse.Namespace, state: GraphState):
+    try:
+        save_graph_state(args.state, args.url_link_repo, state)
+    except OSError as e:
+        print(f"ошибка записи файла состояния: {e}")
+
+
+# отслеживание изменений: раз в --watch_interval секунд проверяем отпечатки прочитанных pom,
+# при изменении пересобираем граф инкрементально и перерисовываем файлы, только если граф изменился
+def watch_graph(args: argparse.Namespace, state: GraphState):
+    print(f"\nотслеживание изменений pom.xml (раз в {args.watch_interval} с), Ctrl+C - выход")
+    try:
+        while True:
+            time.sleep(args.watch_interval)
+            changed = changed_packages(args.url_link_repo, state.packages)
+            if not changed:
+                continue
+
+            new_state, reparsed = build_dependency_graph_incremental(
+                start_name=args.packet_name,
+                start_version=args.packet_version,
+                repo_path=args.url_link_repo,
+                packet_filter=args.packet_filter,
+                previous=state,
+                jobs=args.jobs,
+                start_group=args.packet_group,
+                mediate=args.mediate,
+                scopes=args.scopes,
+                processes=args.jobs_mode == "process"
+            )
+            graph_changed = new_state.graph.to_dict() != state.graph.to_dict()
+            state = new_state
+            if args.state is not None:
+                _save_state(args, state)
+
+            if graph_changed:
+                graph, root_key = _graph_view(
+                    state.graph, f"{args.packet_name}:{args.packet_version}", args.condense
+                )
+                write_graph_files(
+                    graph, args.output_file, root_key, args.svg_compact,
+                    args.puml_max_nodes, args.puml_max_edges
+                )
+
+            print(
+                f"изменено pom: {len(changed)}, разобрано заново: {reparsed}, "
+                f"граф {'перерисован' if graph_changed else 'не изменился'}"
+            )
+    except KeyboardInterrupt:
+        print("\nотслеживание остановлено")
+
+
+# выполнение запрошенных команд
+def run_commands(args: argparse.Namespace):
+    # одно хранилище pom на все команды запуска
+    store = open_store(args)
+    try:
+        if args.manifest is not None:
+            run_batch(args, store)
+        else:
+            _run_commands(args, store)
+    finally:
+        if store is not None:
+            store.close()
+
+
+# хранилище pom по параметрам: по индексу (с его построением), локальное или удаленное
+def open_store(args: argparse.Namespace) -> PomStore | None:
+    if args.index is not None:
+        if args.build_index:
+            index, changed, removed = build_repo_index(
+                args.url_link_repo, args.index, args.jobs, args.jobs_mode == "process"
+            )
+            print(f"индекс: пакетов {len(index)}, разобрано заново {changed}, удалено {removed}")
+        else:
+            index = load_repo_index(args.index, args.url_link_repo)
+            if not index:
+                print("индекс не найден или построен для другого репозитория, pom.xml читаются напрямую")
+        return IndexedPomStore(args.url_link_repo, index)
+    # инкрементальной сборке нужны отпечатки прочитанных pom - их собирает IndexedPomStore
+    if args.state is not None or args.watch:
+        return IndexedPomStore(args.url_link_repo, {})
+    if args.url_link_repo is not None:
+        return open_pom_store(args.url_link_repo, args.http_connections)
+    return None
+
+
+# корни пакетного режима: строки "имя версия [groupId]" или json-объекты
+# {"name": ..., "version": ..., "group": ...}; пустые строки и # - комментарии
+def read_manifest(path: str) -> list[tuple[str, str, str]]:
+    roots: dict[tuple[str, str, str], None] = {} # без повторов, в порядке файла
+
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            if line.startswith("{"):
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"строка {lineno}: {e}") from None
+                name, version, group = item.get("name"), item.get("version"), item.get("group", "")
+            else:
+                fields = line.split()
+                name = fields[0]
+                version = fields[1] if len(fields) > 1 else None
+                group = fields[2] if len(fields) > 2 else ""
+
+            if not name or not version:
+                raise ValueError(f"строка {lineno}: нужны имя и версия пакета")
+            roots[(str(name), str(version), str(group or ""))] = None
+
+    return list(roots)
+
+
+# имя файлов вывода корня: [groupId.]имя-версия без символов, опасных в пути
+def _batch_stem(name: str, version: str, group: str) -> str:
+    stem = f"{group}.{name}-{version}" if group else f"{name}-{version}"
+    return re.sub(r"[^\w.-]", "_", stem)
+
+
+# все команды для одного корня: текстовый вывод в <stem>.txt, рисунки в <stem>.svg/.puml
+def resolve_batch_root(
+    args: argparse.Namespace,
+    store: PomStore,
+    root: tuple[str, str, str]
+) -> str:
+    name, version, group = root
+    stem = _batch_stem(name, version, group)
+
+    root_args = argparse.Namespace(**vars(args))
+    root_args.packet_name = name
+    root_args.packet_version = version
+    root_args.packet_group = group or args.packet_group
+
+    ext = ".svg"
+    if args.output_file is not None:
+        ext = ".svgz" if args.output_file.endswith(".svgz") else ".svg"
+    root_args.output_file = os.path.join(args.batch_output, stem + ext) if args.build_graph else None
+
+    text_path = os.path.join(args.batch_output, stem + ".txt")
+    with open(text_path, "w", encoding="utf-8") as out, redirect_stdout(out):
+        _run_commands(root_args, store)
+    return text_path
+
+
+# состояние процесса-обработчика пакетного режима: свои параметры, хранилище и кэш
+_batch_args: argparse.Namespace | None = None
+_batch_store: PomStore | None = None
+
+
+def _batch_worker_init(args: argparse.Namespace):
+    global pom_cache, run_stats, _batch_args, _batch_store
+    # соединение sqlite родителя после fork не используем - открываем свое
+    pom_cache = None
+    # статистика копится по каждому корню отдельно и возвращается родителю (см. _batch_task)
+    run_stats = None
+    if (args.stats or args.stats_json is not None) and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if args.pom_cache:
+        try:
+            pom_cache = PomCache(args.pom_cache, args.pom_cache_size)
+        except sqlite3.Error:
+            pass
+    _batch_args = args
+    _batch_store = open_store(args)
+
+
+def _batch_task(root: tuple[str, str, str]) -> tuple[str | None, str | None, dict | None]:
+    global run_stats
+    if _batch_args.stats or _batch_args.stats_json is not None:
+        run_stats = RunStats()
+        tracemalloc.reset_peak()
+    try:
+        return resolve_batch_root(_batch_args, _batch_store, root), None, _batch_stats()
+    except Exception as e: # один сломанный корень не останавливает всю пачку
+        return None, str(e), _batch_stats()
+    finally:
+        # обработчик завершается без close - разобранное сохраняем после каждого корня
+        if pom_cache is not None:
+            try:
+                pom_cache.flush()
+            except sqlite3.Error:
+                pass
+
+
+# статистика корня в обработчике для слияния в родителе
+def _batch_stats() -> dict | None:
+    if run_stats is None:
+        return None
+    run_stats.peak_memory = tracemalloc.get_traced_memory()[1]
+    return run_stats.to_dict()
+
+
+# пакетный режим: все корни манифеста в одном процессе с общим хранилищем pom -
+# общие pom разбираются один раз, обход следующих корней идет по уже прочитанным.
+# Общие результаты обхода не переиспользуются: подграф пакета внутри графа другого корня
+# зависит от пути к нему (исключения, действующая область видимости, у корня еще и test,
+# provided и optional зависимости, выбор версий по всему обходу), поэтому каждый корень
+# обходится заново - по уже разобранным моделям, без чтения файлов.
+# С --batch_processes корни распределяются по процессам, у каждого свое хранилище
+def run_batch(args: argparse.Namespace, store: PomStore | None):
+    try:
+        roots = read_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        print(f"ошибка чтения манифеста: {e}")
+        sys.exit(2)
+
+    started = time.perf_counter()
+    failed = 0
+
+    if args.batch_processes > 1:
+        # индекс уже построен родителем, внутри обработчика - без вложенных пулов процессов
+        worker_args = argparse.Namespace(**vars(args))
+        worker_args.build_index = False
+        worker_args.jobs_mode = "thread"
+        with ProcessPoolExecutor(
+            max_workers=args.batch_processes,
+            initializer=_batch_worker_init,
+            initargs=(worker_args,)
+        ) as executor:
+            results = []
+            for path, error, stats in executor.map(_batch_task, roots):
+                if stats is not None and run_stats is not None:
+                    run_stats.merge(stats)
+                results.append((path, error))
+    else:
+        results = []
+        for root in roots:
+            try:
+                results.append((resolve_batch_root(args, store, root), None))
+            except Exception as e: # один сломанный корень не останавливает всю пачку
+                results.append((None, str(e)))
+
+    for (name, version, _), (path, error) in zip(roots, results):
+        if error is not None:
+            failed += 1
+            print(f"{name} {version}: ошибка: {error}")
+        else:
+            print(f"{name} {version}: {path}")
+
+    print(
+        f"\nпакетный режим: корней {len(roots)}, ошибок {failed}, "
+        f"время {time.perf_counter() - started:.2f} с"
+    )
+
+
+# граф для команд: инкрементально по состоянию прошлой сборки или обходом в ширину
+# omitted пополняется ребрами, опущенными при выборе версий (--mediate)
+def _build_graph(
+    args: argparse.Namespace,
+    store: PomStore,
+    omitted: list[tuple[str, str, str]],
+    previous: GraphState | None = None
+) -> tuple[Mapping[str, list[str]], GraphState | None]:
+    if args.state is not None or args.watch:
+        state, reparsed = build_dependency_graph_incremental(
+            start_name=args.packet_name,
+            start_version=args.packet_version,
+            repo_path=args.url_link_repo,
+            packet_filter=args.packet_filter,
+            previous=previous,
+            jobs=args.jobs,
+            start_group=args.packet_group,
+            mediate=args.mediate,
+            scopes=args.scopes,
+            store=store,
+            processes=args.jobs_mode == "process"
+        )
+        if args.state is not None:
+            _save_state(args, state)
+            print(f"инкрементальная сборка: pom разобрано заново {reparsed}")
+        omitted.extend(state.omitted)
+        return state.graph, state
+
+    graph = build_dependency_graph_bfs(
+        start_name=args.packet_name,
+        start_version=args.packet_version,
+        repo_path=args.url_link_repo,
+        packet_filter=args.packet_filter,
+        store=store,
+        jobs=args.jobs,
+        processes=args.jobs_mode == "process",
+        start_group=args.packet_group,
+        mediate=args.mediate,
+        omitted=omitted,
+        scopes=args.scopes
+    )
+    return graph, None
+
+def _run_commands(args: argparse.Namespace, store: PomStore | None):
+    builds_graph = args.build_graph or args.load_order or args.cycles
+
+    # прошлое состояние читаем до всех команд: его pom попадают в общее хранилище,
+    # и --show_direct_deps тоже не разбирает их заново
+    previous: GraphState | None = None
+    if builds_graph and args.state is not None:
+        previous = load_graph_state(args.state, args.url_link_repo)
+        if previous is not None:
+            store.add_known(previous.packages)
 
     if args.show_direct_deps: # если есть запрос
-        if args.url_link_repo is None: # нет пути
+        if store is None: # нет пути
             print("для --show_direct_deps требуется параметр --url_link_repo для нахождения pom.xml")
             sys.exit(2)
         show_direct_dependens(
             args.url_link_repo,
             args.packet_name,
-            args.packet_version
+            args.packet_version,
+            store=store,
+            group=args.packet_group
         )
 
 
 
-    # построение графа зависимостей
-    if args.build_graph:
-        if args.url_link_repo is None:
-            print("для --build_graph требуется параметр --url_link_repo")
+    # граф нужен нескольким командам - строим его один раз
+    for flag, enabled in (
+        ("--build_graph", args.build_graph),
+        ("--load_order", args.load_order),
+        ("--cycles", args.cycles),
+        ("--why", args.why is not None),
+    ):
+        if enabled and store is None:
+            print(f"для {flag} требуется параметр --url_link_repo")
             sys.exit(2)
 
-        graph = build_dependency_graph_bfs(
-            start_name=args.packet_name,
-            start_version=args.packet_version,
-            repo_path=args.url_link_repo,
-            packet_filter=args.packet_filter
-        )
+    # корень: имя:версия
+    root_key = f"{args.packet_name}:{args.packet_version}"
 
-        plantuml_text = graph_to_plantuml(graph)
+    state: GraphState | None = None # состояние для инкрементальной сборки
 
-        if args.output_file:
-            base, _ = os.path.splitext(args.output_file)
-            puml_path = base + ".puml"
+    if builds_graph:
+        omitted: list[tuple[str, str, str]] = []
+        with _stats_phase("bfs"):
+            graph, state = _build_graph(args, store, omitted, previous)
 
-            try:
-                with open(puml_path, "w", encoding="utf-8") as f:
-                    f.write(plantuml_text)
-            except OSError as e:
-                print(f"ошибка записи PlantUML-файла: {e}")
+        if omitted:
+            print("\nопущенные версии (выбрана ближайшая к корню):")
+            for src, lost, winner in omitted:
+                print(f"{src} -> {lost} (выбрана {winner})")
 
-            root_key = f"{args.packet_name}:{args.packet_version}"
+        components = None
+        with _stats_phase("cycles"):
+            if args.cycles or args.condense:
+                components = strongly_connected_components(graph)
+            cycles = find_cycles(graph, components) if args.cycles else []
 
-            # свг
-            try:
-                save_graph_as_svg(graph, args.output_file, root_key)
-            except OSError as e:
-                print(f"ошибка записи SVG-файла: {e}")
+            # дальше работаем со сжатым графом, корень - компонента корневого пакета
+            graph, root_key = _graph_view(graph, root_key, args.condense, components)
+
+        if run_stats is not None:
+            run_stats.count_graph(graph)
 
+    # построение графа зависимостей
+    if args.build_graph:
+        if args.output_file:
+            write_graph_files(
+                graph, args.output_file, root_key, args.svg_compact,
+                args.puml_max_nodes, args.puml_max_edges
+            )
 
         # дерево или списко
-        if args.format == "ascii":
-            # корень: имя:версия
-            root_key = f"{args.packet_name}:{args.packet_version}"
-            print_ascii_tree(graph, root_key)
-        else:
-            print_graph_ascii(graph)
+        with _stats_phase("ascii"):
+            if args.format == "ascii":
+                print_ascii_tree(graph, root_key, args.max_depth)
+            else:
+                print_graph_ascii(graph)
+
+
+    # поиск циклов
+    if args.cycles:
+        print_cycles(cycles)
 
 
     # вывод порядка загрузки зависимостей
     if args.load_order:
-        if args.url_link_repo is None:
-            print("для --load_order требуется параметр --url_link_repo")
-            sys.exit(2)
-
-        load_order = compute_load_order(
-            start_name=args.packet_name,
-            start_version=args.packet_version,
-            repo_path=args.url_link_repo,
-            packet_filter=args.packet_filter
-        )
+        broken_edges: list[tuple[str, str]] = []
+        with _stats_phase("load_order"):
+            load_order = load_order_from_graph(graph, root_key, broken_edges)
 
         print("\nпорядок загрузки зависимостей:")
         if not load_order:
@@ -580,6 +3414,29 @@ def main():
             for i in load_order:
                 print(i)
 
+        # циклы не скрываем: показываем ребра, которые пришлось пропустить
+        if broken_edges:
+            print("\nциклические зависимости (ребро пропущено при упорядочивании):")
+            for src, dst in broken_edges:
+                print(f"{src} -> {dst}")
+
+
+    # откуда в графе пакет: граф не строится, обход идет только до пакета
+    if args.why is not None:
+        with _stats_phase("why"):
+            graph = DependencyGraph(
+                args.packet_name, args.packet_version, store,
+                packet_filter=args.packet_filter,
+                scopes=args.scopes,
+                root_group=args.packet_group
+            )
+            print_why(graph, args.why.strip(), args.why_all)
+
+
+    # перерисовка при изменении pom
+    if args.watch:
+        watch_graph(args, state)
+
 
     # вывод параметров
     # print("параметры, настраиваемые пользователем (ключ-значение):")